@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+环形二进制日志回放工具
+把udp_receiver.py写出的.ringlog文件重新展开成可读文本
+
+热路径上只写定长头+原始载荷, 十六进制展开和时间格式化都推迟到这里离线完成。
+用法: python dump_log.py <文件.ringlog> [更多文件...]
+"""
+
+import socket
+import struct
+import sys
+from datetime import datetime
+
+# 与udp_receiver.py的_RingLogWriter保持一致的文件布局
+_RING_MAGIC = b'RUL1'
+_FILE_HDR = struct.Struct('<4sIQ')   # 魔数, 记录区大小, 写指针
+_REC_HDR = struct.Struct('<QH4sHI')  # 墙钟ns, 本地端口, 源IP, 源端口, 载荷长
+_REC_MAX = 2048
+
+
+def _scan(raw, start, end):
+    """顺序解析[start, end)内的记录, 遇到无效头即停止
+
+    回绕后写指针之后的旧数据区记录边界不一定对齐,
+    这一段按尽力而为回放(从第一个看似有效的位置开始可能解不出来)
+    """
+    base = _FILE_HDR.size
+    off = start
+    count = 0
+    while off + _REC_HDR.size <= end:
+        ts_ns, port, ip4, src_port, ln = _REC_HDR.unpack_from(raw, base + off)
+        # 未写区域/回绕填充的判据只有ts_ns==0(墙钟ns不可能为0);
+        # ln==0是合法的空UDP数据报, 不能当作结束标志
+        if ts_ns == 0 or ln > _REC_MAX \
+                or off + _REC_HDR.size + ln > end:
+            break
+        payload_off = base + off + _REC_HDR.size
+        payload = raw[payload_off:payload_off + ln]
+        ts = datetime.fromtimestamp(ts_ns / 1e9)
+        print(f"[{ts}] [端口 {port}] [{socket.inet_ntoa(ip4)}:{src_port}] "
+              f"[{ln}字节] {payload.hex()}")
+        off += _REC_HDR.size + ln
+        count += 1
+    return count
+
+
+def dump_file(path):
+    """回放单个环形日志文件"""
+    with open(path, 'rb') as f:
+        raw = f.read()
+
+    if len(raw) < _FILE_HDR.size:
+        print(f"错误: {path} 不是有效的环形日志文件(太短)")
+        return
+
+    magic, area, head = _FILE_HDR.unpack_from(raw, 0)
+    if magic != _RING_MAGIC:
+        print(f"错误: {path} 魔数不匹配, 不是udp_receiver的环形日志")
+        return
+
+    print(f"===== {path} (记录区 {area} 字节, 写指针 {head}) =====")
+    # 先回放写指针之后的旧数据(尽力而为), 再回放写指针之前的最新数据
+    count = _scan(raw, head, area)
+    count += _scan(raw, 0, head)
+    print(f"共回放 {count} 条记录")
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("用法: python dump_log.py <文件.ringlog> [更多文件...]")
+        return
+
+    for path in sys.argv[1:]:
+        dump_file(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,42 @@ import struct
 import time
 from typing import Optional, Tuple, Dict, Any
 from stable_baselines3 import PPO
+from stable_baselines3.common.vec_env import SubprocVecEnv
+
+try:
+    from numba import njit
+except ImportError:  # numba未安装时退化为纯Python实现
+    njit = None
+
+def _reward_kernel(s4: float, s5: float,
+                   a0: float, a1: float, a2: float, a3: float) -> float:
+    """标量奖励核心计算, 有Numba时JIT编译为原生代码"""
+    lat = abs(s5)
+    reward = -2.0 * lat - 0.5 * abs(s4 - 20.0)
+    if abs(a3) > 0.5:  # 如果执行了变道
+        if lat < 0.5:  # 变道成功
+            reward += 10.0
+        else:  # 变道失败
+            reward -= 5.0
+    # 平滑控制奖励
+    reward -= 0.1 * (a0 * a0 + a1 * a1 + a2 * a2)
+    return reward
+
+if njit is not None:
+    _py_reward_kernel = _reward_kernel
+    _reward_kernel = njit(cache=True, fastmath=True)(_py_reward_kernel)
+    try:
+        # AOT编译为C函数指针, 经ctypes调用可绕过numba的调度trampoline
+        from numba import cfunc, types
+        _f32 = types.float32
+        _reward_kernel = cfunc(
+            types.float64(_f32, _f32, _f32, _f32, _f32, _f32),
+            cache=True)(_py_reward_kernel).ctypes
+    except Exception:
+        pass  # cfunc不可用时保留njit版本
+
+# 状态帧载荷: 4字节前缀后跟10个float32
+_STATE_STRUCT = struct.Struct('<10f')
 
 class LaneChangeDirection:
     LEFT = 0
@@ -21,22 +57,36 @@ class ResimEnv(gym.Env):
     """
     metadata = {'render_modes': ['human']}
     
-    def __init__(self, 
+    def __init__(self,
                  agent_id: int = 10,
-                 ip: str = "127.0.0.1", 
+                 ip: str = "127.0.0.1",
                  port: int = 20001,
+                 receive_port: int = 20000,
                  debug: bool = True):
         super().__init__()
-        
+
         # 通信设置
         self.agent_id = agent_id
         self.ip = ip
-        self.send_port = port        # 发送到Resim的端口(20001)
-        self.receive_port = 20000    # 从Resim接收数据的端口
+        self.send_port = port          # 发送到Resim的端口(20001)
+        self.receive_port = receive_port  # 从Resim接收数据的端口
         self.debug = debug
         
-        # 创建UDP Socket
+        # 创建UDP Socket, 所有命令复用同一个socket发送
+        # 加大发送缓冲区吸收突发, 并改为非阻塞避免sendto拖慢step
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1 << 20)
+        self.socket.setblocking(False)
+        self._addr = (self.ip, self.send_port)
+
+        # 接收socket: 由Resim的回复驱动节奏, 取代固定sleep
+        # SO_REUSEPORT让多个VecEnv子进程可共享同一接收端口,
+        # 由内核把Resim回传的数据报分摊到各worker
+        self.recv_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        if hasattr(socket, 'SO_REUSEPORT'):
+            self.recv_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        self.recv_socket.bind(("0.0.0.0", self.receive_port))
+        self.recv_socket.settimeout(0.1)
         
         # 设置动作空间: [加速度, 制动, 转向, 变道指令]
         # 加速度: [0,1], 制动: [0,1], 转向: [-1,1], 变道: [-1,1]
@@ -53,11 +103,34 @@ class ResimEnv(gym.Env):
             dtype=np.float32
         )
         
+        # 预构建命令模板: agent_id在回合内固定, 头部(前缀+agent_id)只打包一次
+        # 单个int的编码用int.to_bytes, 比struct.pack少走格式解析
+        agent_bytes = agent_id.to_bytes(4, 'little', signed=True)
+        self._ctrl_hdr = b'FCON' + agent_bytes
+        self._lane_hdr = b'FCAL' + agent_bytes
+        self._ctrl_pack = struct.Struct('<fff').pack
+        self._lane_pack = struct.Struct('<ii').pack
+        self._reset_cmd = b'FRS'
+        self._start_cmd = b'FCS'
+
+        # 复合命令头: 控制+变道合并为一帧, 每步只发一个UDP包
+        self._comp_hdr = b'FCCC' + agent_bytes
+
         # 内部状态
         self.max_steps = 1000
         self.current_step = 0
         self.last_state = np.zeros(10, dtype=np.float32)
-        
+
+        # 模拟状态用的RNG与复用缓冲区, 避免每步分配新数组
+        # (回合中途SB3会立即把观测拷入rollout buffer, 复用是安全的;
+        # 回合结束时worker会把观测存进terminal_observation再reset,
+        # 那一步必须返回拷贝, 否则reset原地覆盖终止观测 -- 见step)
+        self._rng = np.random.default_rng()
+        self._state_buf = np.empty(10, dtype=np.float32)
+
+        # 预热奖励核心, 让JIT编译发生在训练开始之前
+        _reward_kernel(0.0, 0.0, 0.0, 0.0, 0.0, 0.0)
+
         if self.debug:
             print(f"初始化完成，将发送命令到 {self.ip}:{self.send_port}")
     
@@ -66,124 +139,137 @@ class ResimEnv(gym.Env):
         try:
             if self.debug:
                 print(f"发送命令: {command.hex()}")
-            
-            # 创建一个新的socket进行发送，避免连接问题
-            send_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            send_sock.sendto(command, (self.ip, self.send_port))
-            send_sock.close()
+
+            # 复用__init__中创建的socket, 避免每次发送的socket/close系统调用
+            self.socket.sendto(command, self._addr)
+        except BlockingIOError:
+            # 内核发送缓冲区已满, 丢弃本包(UDP语义下可接受)
+            pass
         except Exception as e:
             print(f"发送命令失败: {e}")
-    
-    def _create_lane_change_command(self, agent_id: int, direction: int, mode: int = 0) -> bytes:
+
+    def _create_lane_change_command(self, direction: int, mode: int = 0) -> bytes:
         """
         创建车道变换命令 - 按照resim_lane_change.py中的格式
-        
+
         格式: 'FCAL' + agent_id(4字节) + direction(4字节) + mode(4字节)
         """
-        command = b'FCAL'  # 前缀标识
-        command += struct.pack('<i', agent_id)  # 车辆ID
-        command += struct.pack('<i', direction)  # 变道方向: 0=左, 1=右
-        command += struct.pack('<i', mode)  # 变道模式: 0=检查风险, 1=强制变道
-        
-        return command
-    
-    def _create_control_command(self, agent_id: int, accel: float, brake: float, steer: float) -> bytes:
+        # 头部(前缀+agent_id)已在__init__中预构建, 只打包可变尾部
+        return self._lane_hdr + self._lane_pack(direction, mode)
+
+    def _create_control_command(self, accel: float, brake: float, steer: float) -> bytes:
         """
         创建基本控制命令 - 推测Resim期望的格式
         """
-        # 这部分需要根据Resim的实际期望格式调整
-        # 这里假设基本控制命令格式为 'FCON' + agent_id + accel + brake + steer
-        command = b'FCON'
-        command += struct.pack('<i', agent_id)
-        command += struct.pack('<f', accel)
-        command += struct.pack('<f', brake)
-        command += struct.pack('<f', steer)
-        
-        return command
-    
+        # 格式: 'FCON' + agent_id + accel + brake + steer, 头部已预构建
+        return self._ctrl_hdr + self._ctrl_pack(accel, brake, steer)
+
+    def _create_composite_command(self, accel: float, brake: float, steer: float,
+                                  lane_dir: int, lane_mode: int) -> bytes:
+        """
+        创建复合命令 - 控制与变道合并在一个UDP帧里
+
+        格式: 'FCCC' + agent_id + accel + brake + steer + lane_dir + lane_mode
+        lane_dir为-1表示本步不变道 (需要Resim端配套的解码支持)
+        """
+        return (self._comp_hdr + self._ctrl_pack(accel, brake, steer)
+                + self._lane_pack(lane_dir, lane_mode))
+
     def _create_reset_command(self) -> bytes:
         """创建重置命令"""
-        return b'FRS'  # 假设重置命令前缀为F
-    
+        return self._reset_cmd  # 假设重置命令前缀为F
+
     def _create_start_command(self) -> bytes:
         """创建开始模拟命令"""
-        return b'FCS'  # 假设开始命令前缀为F
+        return self._start_cmd  # 假设开始命令前缀为F
     
+    def _wait_for_reply(self, timeout: float) -> bool:
+        """等待Resim的确认帧, 超时返回False"""
+        self.recv_socket.settimeout(timeout)
+        try:
+            self.recv_socket.recvfrom(4096)
+            return True
+        except socket.timeout:
+            return False
+        finally:
+            self.recv_socket.settimeout(0.1)
+
     def _get_state(self) -> np.ndarray:
         """
-        获取当前状态 - 这需要与Resim的实际状态格式对应
-        由于我们没有实际接收数据，这里返回模拟状态
+        获取当前状态 - 优先阻塞等待Resim回传的状态帧
+
+        未收到数据(如Resim尚未连接)时退化为模拟状态
         """
-        # 在实际应用中，应该使用socket接收数据并解析
-        # 这里使用模拟数据
-        state = np.random.rand(10).astype(np.float32)
-        
-        # 标准化一些值以使其更合理
-        state[4] = 20.0 + np.random.normal(0, 2)  # 速度约为20 m/s
-        state[5] = np.random.normal(0, 0.5)  # 横向偏差
-        
+        try:
+            data, _ = self.recv_socket.recvfrom(4096)
+            if len(data) >= 4 + _STATE_STRUCT.size:
+                self._state_buf[:] = _STATE_STRUCT.unpack_from(data, 4)
+                self.last_state = self._state_buf
+                return self._state_buf
+        except socket.timeout:
+            pass
+
+        # 回退: 使用模拟数据, 原地填充复用缓冲区
+        state = self._state_buf
+        self._rng.random(dtype=np.float32, out=state)
+
+        # 标准化一些值以使其更合理, 两个正态值一次抽取
+        n = self._rng.standard_normal(2)
+        state[4] = 20.0 + 2.0 * n[0]  # 速度约为20 m/s
+        state[5] = 0.5 * n[1]  # 横向偏差
+
         self.last_state = state
         return state
     
+    @staticmethod
+    def _calculate_reward_batch(states: np.ndarray, actions: np.ndarray) -> np.ndarray:
+        """
+        批量计算奖励 - 对(N,10)状态和(N,4)动作做一次向量化计算
+
+        供离线回放/回放缓冲区重算奖励时使用, 避免逐条Python调用
+        """
+        # 车道保持 + 速度匹配
+        lat = np.abs(states[:, 5])  # 横向偏差
+        speed_diff = np.abs(states[:, 4] - 20.0)
+
+        # 平滑控制
+        smooth = -(actions[:, 0]**2 + actions[:, 1]**2 + actions[:, 2]**2)
+
+        # 变道奖励: 成功/失败用布尔掩码代替分支
+        lane = np.abs(actions[:, 3]) > 0.5
+        success = lane & (lat < 0.5)
+        fail = lane & ~(lat < 0.5)
+
+        return (-2.0 * lat - 0.5 * speed_diff + 0.1 * smooth
+                + 10.0 * success - 5.0 * fail)
+
     def _calculate_reward(self, state: np.ndarray, action: np.ndarray) -> float:
         """计算奖励函数"""
-        reward = 0.0
-        
-        # 车道保持奖励
-        lateral_deviation = abs(state[5])  # 横向偏差
-        reward -= lateral_deviation * 2.0
-        
-        # 速度匹配奖励
-        current_speed = state[4]
-        target_speed = 20.0
-        speed_diff = abs(current_speed - target_speed)
-        reward -= speed_diff * 0.5
-        
-        # 变道奖励
-        if abs(action[3]) > 0.5:  # 如果执行了变道
-            if lateral_deviation < 0.5:  # 变道成功
-                reward += 10.0
-            else:  # 变道失败
-                reward -= 5.0
-        
-        # 平滑控制奖励
-        control_smoothness = -(action[0]**2 + action[1]**2 + action[2]**2)
-        reward += control_smoothness * 0.1
-        
-        return reward
+        return float(_reward_kernel(state[4], state[5],
+                                    action[0], action[1], action[2], action[3]))
     
     def step(self, action: np.ndarray) -> Tuple[np.ndarray, float, bool, bool, Dict[str, Any]]:
         """执行一步动作"""
         self.current_step += 1
-        
-        # 处理车道变换动作
-        if abs(action[3]) > 0.5:
-            direction = LaneChangeDirection.LEFT if action[3] < 0 else LaneChangeDirection.RIGHT
-            mode = LaneChangeMode.FORCE_CHANGE  # 使用强制变道以确保执行
-            
-            lane_change_cmd = self._create_lane_change_command(
-                agent_id=self.agent_id,
-                direction=direction,
-                mode=mode
-            )
-            
-            self._send_command(lane_change_cmd)
+
+        # 变道判定: 平方比较代替abs, 方向按符号取0/1, -1表示不变道
+        a3 = float(action[3])
+        if a3 * a3 > 0.25:
+            lane_dir = int(a3 > 0)
+            lane_mode = LaneChangeMode.FORCE_CHANGE  # 使用强制变道以确保执行
             if self.debug:
-                print(f"执行变道: {'左' if direction == LaneChangeDirection.LEFT else '右'}")
-        
-        # 发送基本控制命令
-        control_cmd = self._create_control_command(
-            agent_id=self.agent_id,
-            accel=float(action[0]),
-            brake=float(action[1]),
-            steer=float(action[2])
-        )
-        self._send_command(control_cmd)
-        
-        # 等待Resim处理命令
-        time.sleep(0.05)
-        
-        # 获取新状态
+                print(f"执行变道: {'右' if lane_dir else '左'}")
+        else:
+            lane_dir = -1
+            lane_mode = LaneChangeMode.CHECK_RISK
+
+        # 控制+变道合并为一个复合帧, 每步恰好一次发送
+        self._send_command(self._create_composite_command(
+            float(action[0]), float(action[1]), float(action[2]),
+            lane_dir, lane_mode
+        ))
+
+        # 获取新状态(_get_state阻塞在recv上, 由Resim的回复驱动节奏)
         new_state = self._get_state()
         
         # 计算奖励
@@ -198,11 +284,15 @@ class ResimEnv(gym.Env):
             terminated = True
             reward -= 20.0
         
-        info = {
-            "step": self.current_step,
-            "agent_id": self.agent_id
-        }
-        
+        # info每步新建: worker会往里塞terminal_observation等键,
+        # 复用同一字典会把旧键带进后续step
+        info = {"step": self.current_step, "agent_id": self.agent_id}
+
+        # 回合结束时返回缓冲区的拷贝: worker把它记作terminal_observation
+        # 之后才调用reset, 而reset会原地覆盖复用缓冲区
+        if terminated or truncated:
+            new_state = new_state.copy()
+
         return new_state, reward, terminated, truncated, info
     
     def reset(self, seed=None, options=None) -> Tuple[np.ndarray, Dict[str, Any]]:
@@ -211,13 +301,13 @@ class ResimEnv(gym.Env):
         
         self.current_step = 0
         
-        # 发送重置命令
+        # 发送重置命令并等待确认
         self._send_command(self._create_reset_command())
-        time.sleep(0.5)
-        
-        # 发送开始命令
+        self._wait_for_reply(0.5)
+
+        # 发送开始命令并等待确认
         self._send_command(self._create_start_command())
-        time.sleep(0.1)
+        self._wait_for_reply(0.1)
         
         # 获取初始状态
         initial_state = self._get_state()
@@ -228,15 +318,25 @@ class ResimEnv(gym.Env):
         """关闭环境"""
         if hasattr(self, 'socket'):
             self.socket.close()
+        if hasattr(self, 'recv_socket'):
+            self.recv_socket.close()
             
-def train_resim_agent():
+def make_env(agent_id: int, send_port: int = 20001, recv_port: int = 20000):
+    """返回构造单个ResimEnv的工厂函数, 供VecEnv在子进程中调用"""
+    def _init():
+        return ResimEnv(agent_id=agent_id, port=send_port,
+                        receive_port=recv_port, debug=False)
+    return _init
+
+def train_resim_agent(n_envs: int = 8):
     """训练Resim代理"""
     print("====== Resim RL 训练 ======")
     print("请确保Resim已在QT平台启动，并启用了DS模式")
     input("按Enter继续...")
-    
-    # 创建环境
-    env = ResimEnv(agent_id=10, debug=True)
+
+    # 创建并行环境: 每个子进程一个agent_id和接收端口, rollout并行采集
+    env = SubprocVecEnv([make_env(agent_id=10 + i, recv_port=20000 + i * 2)
+                         for i in range(n_envs)])
     
     # 设置模型
     model = PPO(
@@ -7,11 +7,17 @@ Resim 车道变更命令发送工具
 """
 
 import socket
+import select
 import struct
+import sys
 import time
 import binascii
+import ctypes
+import errno
+import functools
 import logging
 import argparse
+import os
 
 # 配置日志
 logging.basicConfig(
@@ -25,36 +31,126 @@ RESIM_IP = "127.0.0.1"
 RESIM_PORT = 20001  # Resim接收命令的端口
 RECEIVE_PORT = 20000  # 接收Resim响应的端口
 
+# 发送socket只创建一次, 所有命令复用
+_SEND_SOCK = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+# 预编译的struct格式, 避免每次调用重新解析格式串
+_STRUCT_III = struct.Struct('<iii')
+_STRUCT_IIIF = struct.Struct('<iiif')
+
+# Linux下通过recvmmsg(2)一次系统调用批量取出积压的响应数据报
+if sys.platform.startswith("linux"):
+    _libc = ctypes.CDLL("libc.so.6", use_errno=True)
+
+    class _Iovec(ctypes.Structure):
+        _fields_ = [("iov_base", ctypes.c_void_p),
+                    ("iov_len", ctypes.c_size_t)]
+
+    class _Msghdr(ctypes.Structure):
+        _fields_ = [("msg_name", ctypes.c_void_p),
+                    ("msg_namelen", ctypes.c_uint32),
+                    ("msg_iov", ctypes.POINTER(_Iovec)),
+                    ("msg_iovlen", ctypes.c_size_t),
+                    ("msg_control", ctypes.c_void_p),
+                    ("msg_controllen", ctypes.c_size_t),
+                    ("msg_flags", ctypes.c_int)]
+
+    class _Mmsghdr(ctypes.Structure):
+        _fields_ = [("msg_hdr", _Msghdr),
+                    ("msg_len", ctypes.c_uint)]
+
+    class _SockaddrIn(ctypes.Structure):
+        _fields_ = [("sin_family", ctypes.c_ushort),
+                    ("sin_port", ctypes.c_uint16),
+                    ("sin_addr", ctypes.c_uint32),
+                    ("sin_zero", ctypes.c_char * 8)]
+
+    _RECV_BATCH = 32
+    _MSG_DONTWAIT = 0x40
+    # 接收缓冲池在导入时分配一次, 各次调用复用
+    _recv_bufs = [ctypes.create_string_buffer(2048) for _ in range(_RECV_BATCH)]
+    _recv_iovs = (_Iovec * _RECV_BATCH)()
+    _recv_addrs = (_SockaddrIn * _RECV_BATCH)()
+    _recv_hdrs = (_Mmsghdr * _RECV_BATCH)()
+    for _i in range(_RECV_BATCH):
+        _recv_iovs[_i].iov_base = ctypes.cast(_recv_bufs[_i], ctypes.c_void_p)
+        _recv_iovs[_i].iov_len = 2048
+        _recv_hdrs[_i].msg_hdr.msg_iov = ctypes.pointer(_recv_iovs[_i])
+        _recv_hdrs[_i].msg_hdr.msg_iovlen = 1
+        _recv_hdrs[_i].msg_hdr.msg_name = ctypes.cast(
+            ctypes.pointer(_recv_addrs[_i]), ctypes.c_void_p)
+        _recv_hdrs[_i].msg_hdr.msg_namelen = ctypes.sizeof(_SockaddrIn)
+
+    def _recv_batch(sock, max_pkts=_RECV_BATCH):
+        """批量取出已到达的数据报, 返回[(data, addr), ...]"""
+        n = _libc.recvmmsg(sock.fileno(), _recv_hdrs, max_pkts, _MSG_DONTWAIT, None)
+        if n < 0:
+            err = ctypes.get_errno()
+            if err in (errno.EAGAIN, errno.EWOULDBLOCK):
+                return []
+            raise OSError(err, os.strerror(err))
+        out = []
+        for i in range(n):
+            sa = _recv_addrs[i]
+            addr = (socket.inet_ntoa(struct.pack('=I', sa.sin_addr)),
+                    socket.ntohs(sa.sin_port))
+            out.append((_recv_bufs[i].raw[:_recv_hdrs[i].msg_len], addr))
+            # 内核可能改写msg_namelen, 复位以便下次调用
+            _recv_hdrs[i].msg_hdr.msg_namelen = ctypes.sizeof(_SockaddrIn)
+        return out
+else:
+    def _recv_batch(sock, max_pkts=32):
+        """非Linux回退: 非阻塞地尽量多收"""
+        out = []
+        sock.setblocking(False)
+        try:
+            while len(out) < max_pkts:
+                try:
+                    out.append(sock.recvfrom(8192))
+                except (BlockingIOError, InterruptedError):
+                    break
+        finally:
+            sock.setblocking(True)
+        return out
+
 def send_command(data, ip=RESIM_IP, port=RESIM_PORT):
     """发送命令到Resim并返回是否成功"""
     try:
-        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        sock.sendto(data, (ip, port))
-        sock.close()
-        
-        # 打印发送的数据
-        hex_data = binascii.hexlify(data).decode()
-        logger.info(f"已发送命令到 {ip}:{port}: {hex_data}")
+        _SEND_SOCK.sendto(data, (ip, port))
+
+        # 打印发送的数据(hex只在INFO级别启用时才计算)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("已发送命令到 %s:%d: %s", ip, port, data.hex())
         return True
     except Exception as e:
         logger.error(f"发送命令失败: {e}")
         return False
 
+@functools.lru_cache(maxsize=4096)
 def create_lane_change_command(agent_id, direction, mode):
     """
     创建标准车道变更命令 - 严格按照Resim代码实现
-    
+
+    参数取值范围小(agent_id 0-99, direction/mode 0-1), 结果直接缓存,
+    重复发送(--count N)时不再重新打包
+
     参数:
         agent_id (int): 车辆ID (0-99)
         direction (int): 变道方向 (0=左, 1=右)
         mode (int): 变道模式 (0=检查风险, 1=强制变道)
-    
+
     返回:
         bytes: 二进制命令数据
     """
     # 使用Resim中期望的格式: 'C' + 'L' + agent_id + direction + mode
     # 从Reisim/udpthread.cpp中可以看到正确的格式
-    return b'CL' + struct.pack('<iii', agent_id, direction, mode)
+    return b'CL' + _STRUCT_III.pack(agent_id, direction, mode)
+
+@functools.lru_cache(maxsize=4096)
+def _build_assigned_command(agent_id, direction, mode, dist_decimeters):
+    """按0.1米粒度缓存的指定距离命令构造"""
+    return b'CAL' + _STRUCT_IIIF.pack(agent_id, direction, mode,
+                                      dist_decimeters / 10.0)
 
 def create_assigned_lane_change_command(agent_id, direction, mode, distance):
     """
@@ -70,7 +166,8 @@ def create_assigned_lane_change_command(agent_id, direction, mode, distance):
         bytes: 二进制命令数据
     """
     # 使用Resim中期望的格式: 'C' + 'A' + 'L' + agent_id + direction + mode + distance
-    return b'CAL' + struct.pack('<iiif', agent_id, direction, mode, distance)
+    # distance按0.1米分桶后走缓存
+    return _build_assigned_command(agent_id, direction, mode, round(distance * 10))
 
 def create_start_simulation_command():
     """创建开始模拟命令"""
@@ -84,6 +181,29 @@ def create_test_message():
     """创建测试消息"""
     return b'TEST_MESSAGE_FROM_PYTHON'
 
+def _log_response(data, addr):
+    """记录并解析一条来自Resim的响应"""
+    hex_data = binascii.hexlify(data).decode()
+    logger.info(f"收到来自 {addr[0]}:{addr[1]} 的响应: {hex_data}")
+
+    if data.startswith(b'RL'):
+        # 车道变更响应
+        try:
+            agent_id, result, reason = _STRUCT_III.unpack_from(data, 2)
+            result_str = "成功" if result == 1 else "失败"
+            reason_codes = {
+                0: "无原因",
+                1: "车道不存在",
+                2: "危险状况",
+                3: "无法变道"
+            }
+            reason_str = reason_codes.get(reason, f"未知原因({reason})")
+            logger.info(f"车道变更响应: 车辆ID={agent_id}, 结果={result_str}, 原因={reason_str}")
+        except Exception as e:
+            logger.error(f"解析响应出错: {e}")
+    else:
+        logger.info(f"收到未知响应，前缀: {data[:4]}")
+
 def listen_for_response(timeout=5, receive_port=RECEIVE_PORT):
     """
     监听来自Resim的UDP响应
@@ -94,8 +214,7 @@ def listen_for_response(timeout=5, receive_port=RECEIVE_PORT):
     """
     try:
         sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        sock.settimeout(0.1)  # 设置短超时以便快速检测端口是否可用
-        
+
         try:
             # 尝试绑定端口
             sock.bind(("0.0.0.0", receive_port))
@@ -106,41 +225,22 @@ def listen_for_response(timeout=5, receive_port=RECEIVE_PORT):
                 return
             else:
                 raise
-                
-        sock.settimeout(timeout)  # 重置为正常超时
-        
-        # 监听数据
+
+        # 监听数据: 用select阻塞到有数据或超时, 避免100ms轮询唤醒
         start_time = time.time()
-        while time.time() - start_time < timeout:
-            try:
-                data, addr = sock.recvfrom(8192)
-                hex_data = binascii.hexlify(data).decode()
-                logger.info(f"收到来自 {addr[0]}:{addr[1]} 的响应: {hex_data}")
-                
-                # 尝试解析响应
-                if data.startswith(b'RL'):
-                    # 车道变更响应
-                    try:
-                        agent_id, result, reason = struct.unpack('<iii', data[2:14])
-                        result_str = "成功" if result == 1 else "失败"
-                        reason_codes = {
-                            0: "无原因",
-                            1: "车道不存在",
-                            2: "危险状况",
-                            3: "无法变道"
-                        }
-                        reason_str = reason_codes.get(reason, f"未知原因({reason})")
-                        logger.info(f"车道变更响应: 车辆ID={agent_id}, 结果={result_str}, 原因={reason_str}")
-                    except Exception as e:
-                        logger.error(f"解析响应出错: {e}")
-                else:
-                    logger.info(f"收到未知响应，前缀: {data[:4]}")
-            except socket.timeout:
-                # 短超时，继续循环
-                continue
-                
-    except socket.timeout:
-        logger.warning("等待响应超时")
+        while True:
+            remaining = timeout - (time.time() - start_time)
+            if remaining <= 0:
+                logger.warning("等待响应超时")
+                break
+            readable, _, _ = select.select([sock], [], [], remaining)
+            if not readable:
+                logger.warning("等待响应超时")
+                break
+            # 批量取出本次唤醒时已积压的所有数据报
+            for data, addr in _recv_batch(sock):
+                _log_response(data, addr)
+
     except Exception as e:
         logger.error(f"接收响应出错: {e}")
     finally:
@@ -9,6 +9,7 @@ Resim DSMode快速修复和测试工具
 2. 发送测试UDP命令并监控响应
 """
 
+import atexit
 import os
 import sys
 import socket
@@ -32,6 +33,13 @@ RESIM_RECEIVE_PORT = 20000
 RESIM_EXE_PATH = "D:/Reisim_BK_UDP/Reisim.exe"  # 根据实际路径修改
 SYS_FILE_PATH = "D:/Reisim_BK_UDP/Lanechange.sysfile"  # 根据实际路径修改
 
+# 预编译的struct格式, 避免每次调用重新解析格式串
+_PACK_III = struct.Struct('<iii').pack
+
+# 发送socket只创建一次, 所有命令复用
+_SOCK = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+atexit.register(_SOCK.close)
+
 def start_resim_with_dsmode():
     """启动Resim并启用DSMode"""
     cmd = f'"{RESIM_EXE_PATH}" --ds-mode --udp-config="{SYS_FILE_PATH}"'
@@ -47,21 +55,23 @@ def start_resim_with_dsmode():
         logging.error(f"启动Resim失败: {e}")
         return False
 
-def send_udp_packet(data, description):
-    """发送UDP数据包并记录日志"""
-    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    
+def send_udp_packet(data, description, delay=0.0):
+    """发送UDP数据包并记录日志
+
+    参数:
+        delay (float): 发送后的可选等待时间(秒), 由调用方按需指定
+    """
     try:
-        sock.sendto(data, (RESIM_IP, RESIM_SEND_PORT))
-        hex_data = binascii.hexlify(data).decode('utf-8')
-        logging.info(f"已发送 {description}: {hex_data}")
-        time.sleep(1)  # 等待处理
+        _SOCK.sendto(data, (RESIM_IP, RESIM_SEND_PORT))
+        # hex只在INFO级别启用时才计算
+        if logging.getLogger().isEnabledFor(logging.INFO):
+            logging.info("已发送 %s: %s", description, data.hex())
+        if delay > 0:
+            time.sleep(delay)
         return True
     except Exception as e:
         logging.error(f"发送数据失败 - {description}: {e}")
         return False
-    finally:
-        sock.close()
 
 def test_start_simulation():
     """测试启动模拟命令"""
@@ -76,7 +86,7 @@ def test_lane_change(agent_id=10, direction=0, force=1):
         direction (int): 方向 (0=左, 1=右)
         force (int): 模式 (0=检查风险, 1=强制)
     """
-    cmd_data = b'CL' + struct.pack('<iii', agent_id, direction, force)
+    cmd_data = b'CL' + _PACK_III(agent_id, direction, force)
     direction_str = "左" if direction == 0 else "右"
     force_str = "强制" if force == 1 else "安全"
     
@@ -6,6 +6,8 @@ Resim 直接命令发送工具
 用于发送原始命令字节到Resim
 """
 
+import atexit
+import functools
 import socket
 import struct
 import time
@@ -24,6 +26,13 @@ logger = logging.getLogger("ResimDirectCommand")
 RESIM_IP = "127.0.0.1"
 RESIM_PORT = 20001  # Resim接收命令的端口
 
+# 预编译的struct格式, 避免每次调用重新解析格式串
+_PACK_III = struct.Struct('<iii').pack
+
+# 发送socket只创建一次, 所有命令复用
+_SOCK = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+atexit.register(_SOCK.close)
+
 def send_raw_bytes(data, ip=RESIM_IP, port=RESIM_PORT):
     """
     发送原始字节到Resim
@@ -34,31 +43,33 @@ def send_raw_bytes(data, ip=RESIM_IP, port=RESIM_PORT):
         port (int): 目标端口
     """
     try:
-        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        sock.sendto(data, (ip, port))
-        sock.close()
-        
-        # 记录发送的数据
-        hex_data = binascii.hexlify(data).decode()
-        logger.info(f"已发送数据到 {ip}:{port}: {hex_data}")
+        _SOCK.sendto(data, (ip, port))
+
+        # 记录发送的数据(hex只在INFO级别启用时才计算)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("已发送数据到 %s:%d: %s", ip, port, data.hex())
         return True
     except Exception as e:
         logger.error(f"发送数据失败: {e}")
         return False
 
+@functools.lru_cache(maxsize=256)
+def _build(prefix, agent_id, direction, mode):
+    """纯函数的字节构造, 结果缓存供重复发送复用"""
+    return prefix + _PACK_III(agent_id, direction, mode)
+
 def send_command(prefix, agent_id=10, direction=0, mode=1):
     """
     发送带有指定前缀的车道变更命令
-    
+
     参数:
         prefix (bytes): 命令前缀
         agent_id (int): 车辆ID
         direction (int): 方向 (0=左, 1=右)
         mode (int): 模式 (0=检查风险, 1=强制变道)
     """
-    command = prefix + struct.pack('<iii', agent_id, direction, mode)
     logger.info(f"发送命令: 前缀={prefix}, 车辆ID={agent_id}, 方向={direction}, 模式={mode}")
-    return send_raw_bytes(command)
+    return send_raw_bytes(_build(prefix, agent_id, direction, mode))
 
 def main():
     """主函数"""
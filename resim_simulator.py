@@ -1,180 +1,255 @@
-#!/usr/bin/env python
-# -*- coding: utf-8 -*-
-
-"""
-Resim模拟器
-模拟Resim接收UDP命令并返回响应
-"""
-
-import socket
-import struct
-import time
-import binascii
-import sys
-import threading
-
-# 默认配置
-LISTEN_PORT = 20001  # Resim命令接收端口
-SEND_PORT = 20000    # Resim发送响应的端口
-LOCAL_IP = "0.0.0.0" # 监听IP
-TARGET_IP = "127.0.0.1" # 发送响应的目标IP
-
-def handle_command(data, addr, send_sock):
-    """处理接收到的命令并返回响应"""
-    # 命令处理逻辑
-    hex_data = binascii.hexlify(data).decode()
-    
-    print(f"\n接收到命令: {hex_data}")
-    
-    if len(data) < 2:
-        print("命令太短，无法处理")
-        return
-    
-    # 尝试解析命令前缀
-    try:
-        prefix = data[:2].decode('ascii', errors='replace')
-    except:
-        prefix = hex_data[:4]
-    
-    # 根据不同命令返回不同的响应
-    response = None
-    
-    if prefix == 'CS':
-        print("收到开始模拟命令")
-        # 返回模拟状态为"运行中"
-        response = b'SS' + struct.pack('<i', 1)
-        
-    elif prefix == 'CP':
-        print("收到暂停模拟命令")
-        # 返回模拟状态为"已暂停"
-        response = b'SS' + struct.pack('<i', 2)
-    
-    elif prefix == 'CL' and len(data) >= 14:
-        try:
-            agent_id = struct.unpack('<i', data[2:6])[0]
-            direction = struct.unpack('<i', data[6:10])[0]
-            mode = struct.unpack('<i', data[10:14])[0]
-            
-            direction_str = "左" if direction == 0 else "右"
-            mode_str = "检查风险" if mode == 0 else "强制变道"
-            
-            print(f"收到车道变更命令: 车辆ID={agent_id}, 方向={direction_str}, 模式={mode_str}")
-            
-            # 返回车道变更成功响应
-            # RL + agent_id + result(1=成功) + reason(0=无原因)
-            response = b'RL' + struct.pack('<iii', agent_id, 1, 0)
-            
-        except Exception as e:
-            print(f"解析CL命令出错: {e}")
-    
-    # 测试消息
-    elif data.startswith(b'TEST_'):
-        try:
-            message = data.decode('utf-8', errors='replace')
-            print(f"收到测试消息: {message}")
-            # 返回测试响应
-            response = b'TEST_RESPONSE_FROM_RESIM'
-        except:
-            print("解析测试消息失败")
-    
-    # 发送响应
-    if response:
-        print(f"发送响应: {binascii.hexlify(response).decode()}")
-        
-        try:
-            send_sock.sendto(response, (TARGET_IP, SEND_PORT))
-            print(f"已发送响应到 {TARGET_IP}:{SEND_PORT}")
-        except Exception as e:
-            print(f"发送响应失败: {e}")
-    else:
-        print(f"未处理命令: {prefix}")
-
-def resim_simulator(listen_port, target_ip, send_port):
-    """
-    模拟Resim的UDP通信
-    
-    参数:
-        listen_port: 监听端口 (接收命令)
-        target_ip: 发送响应的目标IP
-        send_port: 发送响应的目标端口
-    """
-    global TARGET_IP
-    TARGET_IP = target_ip
-    
-    # 创建接收socket
-    recv_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    
-    # 创建发送socket
-    send_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    
-    # 绑定到监听端口
-    try:
-        recv_sock.bind((LOCAL_IP, listen_port))
-        print(f"成功绑定到端口 {listen_port}")
-        print(f"将发送响应到 {target_ip}:{send_port}")
-    except OSError as e:
-        print(f"错误: 无法绑定到端口 {listen_port} - {e}")
-        print("请确认该端口没有被其他程序占用")
-        return
-    
-    # 设置超时，便于退出
-    recv_sock.settimeout(1)
-    
-    # 命令计数
-    command_count = 0
-    
-    # 发送启动消息
-    startup_msg = b'TEST_MESSAGE_FROM_RESIM'
-    try:
-        send_sock.sendto(startup_msg, (target_ip, send_port))
-        print(f"已发送启动消息到 {target_ip}:{send_port}")
-    except Exception as e:
-        print(f"发送启动消息失败: {e}")
-    
-    try:
-        while True:
-            try:
-                # 接收数据
-                data, addr = recv_sock.recvfrom(8192)
-                
-                command_count += 1
-                print(f"\n接收到来自 {addr[0]}:{addr[1]} 的命令 #{command_count} ({len(data)} 字节)")
-                
-                # 处理命令并发送响应
-                handle_command(data, addr, send_sock)
-                
-            except socket.timeout:
-                # 超时，打印点表示程序还在运行
-                sys.stdout.write(".")
-                sys.stdout.flush()
-            except Exception as e:
-                print(f"处理数据时出错: {e}")
-    finally:
-        recv_sock.close()
-        send_sock.close()
-        print("\n模拟器已关闭")
-
-def main():
-    import argparse
-    parser = argparse.ArgumentParser(description="Resim模拟器")
-    parser.add_argument("--listen-port", type=int, default=LISTEN_PORT, 
-                        help=f"监听端口 (默认: {LISTEN_PORT})")
-    parser.add_argument("--send-port", type=int, default=SEND_PORT, 
-                        help=f"发送响应的端口 (默认: {SEND_PORT})")
-    parser.add_argument("--target-ip", type=str, default=TARGET_IP, 
-                        help=f"发送响应的目标IP (默认: {TARGET_IP})")
-    args = parser.parse_args()
-    
-    print("===== Resim模拟器 =====")
-    print(f"监听端口: {args.listen_port}")
-    print(f"响应目标: {args.target_ip}:{args.send_port}")
-    print("按Ctrl+C退出")
-    print("-" * 30)
-    
-    try:
-        resim_simulator(args.listen_port, args.target_ip, args.send_port)
-    except KeyboardInterrupt:
-        print("\n用户中断，退出中...")
-
-if __name__ == "__main__":
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Resim模拟器
+模拟Resim接收UDP命令并返回响应
+"""
+
+import socket
+import struct
+import os
+import queue
+import signal
+import threading
+import logging
+import logging.handlers
+
+# 默认配置
+LISTEN_PORT = 20001  # Resim命令接收端口
+SEND_PORT = 20000    # Resim发送响应的端口
+LOCAL_IP = "0.0.0.0" # 监听IP
+TARGET_IP = "127.0.0.1" # 发送响应的目标IP
+
+# 接收热路径只做一次入队, 格式化和stdout写出在后台QueueListener线程进行
+# 每包细节记在DEBUG(默认被过滤), 每秒汇总记在INFO
+_log_queue = queue.SimpleQueue()
+logger = logging.getLogger("resim_simulator")
+logger.addHandler(logging.handlers.QueueHandler(_log_queue))
+logger.setLevel(logging.INFO)
+_log_listener = logging.handlers.QueueListener(_log_queue, logging.StreamHandler())
+_log_listener.start()
+
+# 预编译的CL命令载荷格式与固定的SS状态响应, 免去每包重新解析/重打包
+_CL_STRUCT = struct.Struct('<iii')
+_SS_RESPONSE_RUN = b'SS' + struct.pack('<i', 1)
+_SS_RESPONSE_PAUSE = b'SS' + struct.pack('<i', 2)
+
+def _handle_cs(data):
+    """CS: 开始模拟"""
+    logger.debug("收到开始模拟命令")
+    # 返回模拟状态为"运行中"
+    return _SS_RESPONSE_RUN
+
+def _handle_cp(data):
+    """CP: 暂停模拟"""
+    logger.debug("收到暂停模拟命令")
+    # 返回模拟状态为"已暂停"
+    return _SS_RESPONSE_PAUSE
+
+def _handle_cl(data):
+    """CL: 车道变更命令"""
+    if len(data) < 14:
+        return None
+    try:
+        # 单次unpack_from直接在缓冲区上读取三个字段, 不产生切片拷贝
+        agent_id, direction, mode = _CL_STRUCT.unpack_from(data, 2)
+
+        logger.debug("收到车道变更命令: 车辆ID=%d, 方向=%s, 模式=%s",
+                     agent_id, "左" if direction == 0 else "右",
+                     "检查风险" if mode == 0 else "强制变道")
+
+        # 返回车道变更成功响应
+        # RL + agent_id + result(1=成功) + reason(0=无原因)
+        return b'RL' + struct.pack('<iii', agent_id, 1, 0)
+
+    except Exception as e:
+        logger.error("解析CL命令出错: %s", e)
+        return None
+
+# 前两字节到处理函数的O(1)分发表, 代替逐个前缀比较
+_HANDLERS = {
+    b'CS': _handle_cs,
+    b'CP': _handle_cp,
+    b'CL': _handle_cl,
+}
+
+def handle_command(data, addr, send_sock):
+    """处理接收到的命令并返回响应
+
+    data可以是bytes或复用缓冲区上的memoryview切片
+    """
+    # 热路径上不做十六进制转换, 仅在DEBUG级别时取前32字节
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("接收到命令: %s", data[:32].hex())
+
+    if len(data) < 2:
+        logger.debug("命令太短，无法处理")
+        return
+
+    # 字典按前两字节直接分发; TEST_前缀留在慢路径
+    response = None
+    handler = _HANDLERS.get(bytes(data[:2]))
+    if handler is not None:
+        response = handler(data)
+
+    elif bytes(data[:5]) == b'TEST_':
+        try:
+            message = str(data, 'utf-8', errors='replace')
+            logger.debug("收到测试消息: %s", message)
+            # 返回测试响应
+            response = b'TEST_RESPONSE_FROM_RESIM'
+        except:
+            logger.debug("解析测试消息失败")
+
+    # 发送响应
+    if response:
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("发送响应: %s", response.hex())
+
+        try:
+            # socket已connect到目标地址, send()省去每包的内核路由/校验
+            send_sock.send(response)
+        except Exception as e:
+            logger.error("发送响应失败: %s", e)
+    else:
+        logger.debug("未处理命令: %s", bytes(data[:2]))
+
+# SO_REUSEPORT可用时开多个接收线程, 内核按流散列到各socket
+_NUM_WORKERS = min(os.cpu_count() or 1, 4) if hasattr(socket, 'SO_REUSEPORT') else 1
+
+def _make_recv_sock(listen_port):
+    """创建并绑定一个接收socket(加大缓冲区, 多worker时带SO_REUSEPORT)"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if _NUM_WORKERS > 1:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+    sock.bind((LOCAL_IP, listen_port))
+    return sock
+
+def _make_send_sock(target_ip, send_port):
+    """创建已connect的发送socket, send()省去每包地址处理"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4 * 1024 * 1024)
+    sock.connect((target_ip, send_port))
+    return sock
+
+def _worker_loop(recv_sock, target_ip, send_port, counts, slot):
+    """单个接收线程: 独立的接收缓冲区和发送socket, 阻塞在recvfrom_into上"""
+    send_sock = _make_send_sock(target_ip, send_port)
+    buf = bytearray(8192)
+    view = memoryview(buf)
+
+    try:
+        while True:
+            try:
+                nbytes, addr = recv_sock.recvfrom_into(buf)
+            except OSError:
+                break  # socket已关闭, 退出线程
+
+            counts[slot] += 1
+            try:
+                handle_command(view[:nbytes], addr, send_sock)
+            except Exception as e:
+                logger.error("处理数据时出错: %s", e)
+    finally:
+        send_sock.close()
+
+def resim_simulator(listen_port, target_ip, send_port):
+    """
+    模拟Resim的UDP通信
+
+    参数:
+        listen_port: 监听端口 (接收命令)
+        target_ip: 发送响应的目标IP
+        send_port: 发送响应的目标端口
+    """
+    global TARGET_IP
+    TARGET_IP = target_ip
+
+    # 为每个worker各绑定一个SO_REUSEPORT socket, 突发负载分摊到多核
+    recv_socks = []
+    try:
+        for _ in range(_NUM_WORKERS):
+            recv_socks.append(_make_recv_sock(listen_port))
+        print(f"成功绑定到端口 {listen_port} ({_NUM_WORKERS} 个接收线程)")
+        print(f"将发送响应到 {target_ip}:{send_port}")
+    except OSError as e:
+        print(f"错误: 无法绑定到端口 {listen_port} - {e}")
+        print("请确认该端口没有被其他程序占用")
+        for s in recv_socks:
+            s.close()
+        return
+
+    # 每线程独立计数, 汇总线程求和, 避免热路径上的共享状态
+    counts = [0] * _NUM_WORKERS
+    stats_stop = threading.Event()
+
+    def _stats_loop():
+        last = 0
+        while not stats_stop.wait(1.0):
+            n = sum(counts)
+            if n != last:
+                logger.info("已处理 %d 条命令 (+%d/s)", n, n - last)
+                last = n
+
+    threading.Thread(target=_stats_loop, daemon=True).start()
+
+    # 发送启动消息
+    startup_sock = _make_send_sock(target_ip, send_port)
+    try:
+        startup_sock.send(b'TEST_MESSAGE_FROM_RESIM')
+        print(f"已发送启动消息到 {target_ip}:{send_port}")
+    except Exception as e:
+        print(f"发送启动消息失败: {e}")
+    finally:
+        startup_sock.close()
+
+    workers = []
+    for slot, sock in enumerate(recv_socks):
+        t = threading.Thread(target=_worker_loop,
+                             args=(sock, target_ip, send_port, counts, slot),
+                             daemon=True)
+        t.start()
+        workers.append(t)
+
+    # 主线程阻塞在Event上, SIGINT唤醒后关闭socket让worker退出
+    stop_evt = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: stop_evt.set())
+
+    try:
+        stop_evt.wait()
+    finally:
+        stats_stop.set()
+        for s in recv_socks:
+            s.close()
+        for t in workers:
+            t.join(timeout=1.0)
+        print("\n模拟器已关闭")
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Resim模拟器")
+    parser.add_argument("--listen-port", type=int, default=LISTEN_PORT, 
+                        help=f"监听端口 (默认: {LISTEN_PORT})")
+    parser.add_argument("--send-port", type=int, default=SEND_PORT, 
+                        help=f"发送响应的端口 (默认: {SEND_PORT})")
+    parser.add_argument("--target-ip", type=str, default=TARGET_IP, 
+                        help=f"发送响应的目标IP (默认: {TARGET_IP})")
+    args = parser.parse_args()
+    
+    print("===== Resim模拟器 =====")
+    print(f"监听端口: {args.listen_port}")
+    print(f"响应目标: {args.target_ip}:{args.send_port}")
+    print("按Ctrl+C退出")
+    print("-" * 30)
+    
+    try:
+        resim_simulator(args.listen_port, args.target_ip, args.send_port)
+    except KeyboardInterrupt:
+        print("\n用户中断，退出中...")
+
+if __name__ == "__main__":
     main() 
\ No newline at end of file
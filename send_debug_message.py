@@ -16,6 +16,71 @@ import sys
 TARGET_IP = "127.0.0.1"  # 本地地址
 TARGET_PORT = 20000      # udp_receiver.py默认监听的端口
 
+# 预编译的TSPY头格式与固定消息尾, 循环里只重打计数器字段
+_TSPY_HDR = struct.Struct('<4si')
+_TSPY_TAIL = b'Continuous test message'
+
+# Linux下通过sendmmsg(2)把一批数据报合并为一次系统调用(无间隔压测场景)
+_SENDMMSG_BATCH = 64
+
+if sys.platform.startswith('linux'):
+    import ctypes
+
+    class _Iovec(ctypes.Structure):
+        _fields_ = [('iov_base', ctypes.c_void_p),
+                    ('iov_len', ctypes.c_size_t)]
+
+    class _Msghdr(ctypes.Structure):
+        _fields_ = [('msg_name', ctypes.c_void_p),
+                    ('msg_namelen', ctypes.c_uint32),
+                    ('msg_iov', ctypes.POINTER(_Iovec)),
+                    ('msg_iovlen', ctypes.c_size_t),
+                    ('msg_control', ctypes.c_void_p),
+                    ('msg_controllen', ctypes.c_size_t),
+                    ('msg_flags', ctypes.c_int)]
+
+    class _Mmsghdr(ctypes.Structure):
+        _fields_ = [('msg_hdr', _Msghdr),
+                    ('msg_len', ctypes.c_uint)]
+
+    class _SockaddrIn(ctypes.Structure):
+        _fields_ = [('sin_family', ctypes.c_ushort),
+                    ('sin_port', ctypes.c_uint16),
+                    ('sin_addr', ctypes.c_uint32),
+                    ('sin_zero', ctypes.c_ubyte * 8)]
+
+    try:
+        _libc = ctypes.CDLL('libc.so.6', use_errno=True)
+    except OSError:
+        _libc = None
+else:
+    _libc = None
+
+def _send_batch_mmsg(sock, payloads, ip, port):
+    """一次sendmmsg系统调用发送一组数据报, 返回内核实际接收的条数"""
+    n = len(payloads)
+    sa = _SockaddrIn()
+    sa.sin_family = socket.AF_INET
+    sa.sin_port = socket.htons(port)
+    # inet_aton返回网络序字节, 按本机内存序重新解释以保持结构体布局
+    sa.sin_addr = struct.unpack('=I', socket.inet_aton(ip))[0]
+
+    bufs = [ctypes.create_string_buffer(p, len(p)) for p in payloads]
+    iovs = (_Iovec * n)()
+    hdrs = (_Mmsghdr * n)()
+    for i, b in enumerate(bufs):
+        iovs[i].iov_base = ctypes.cast(b, ctypes.c_void_p)
+        iovs[i].iov_len = len(payloads[i])
+        hdrs[i].msg_hdr.msg_name = ctypes.cast(ctypes.pointer(sa), ctypes.c_void_p)
+        hdrs[i].msg_hdr.msg_namelen = ctypes.sizeof(sa)
+        hdrs[i].msg_hdr.msg_iov = ctypes.pointer(iovs[i])
+        hdrs[i].msg_hdr.msg_iovlen = 1
+
+    sent = _libc.sendmmsg(sock.fileno(), hdrs, n, 0)
+    if sent < 0:
+        raise OSError(ctypes.get_errno(), "sendmmsg调用失败")
+    return sent
+
 def send_test_message():
     """发送测试消息到接收端"""
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
@@ -65,14 +130,27 @@ def send_continuous_messages(count=10, interval=1.0):
     
     try:
         print(f"开始持续发送消息: 次数={count}, 间隔={interval}秒")
-        
+
+        # 无间隔压测: Linux上按批合并系统调用, N次sendto变为N/64次sendmmsg
+        if interval <= 0 and _libc is not None:
+            sent_total = 0
+            for start in range(0, count, _SENDMMSG_BATCH):
+                batch = [_TSPY_HDR.pack(b'TSPY', i + 1) + _TSPY_TAIL
+                         for i in range(start, min(start + _SENDMMSG_BATCH, count))]
+                sent_total += _send_batch_mmsg(sock, batch, TARGET_IP, TARGET_PORT)
+            print(f"批量发送完成: {sent_total}/{count}")
+            return
+
+        # 固定缓冲区: 消息尾只写一次, 循环里仅pack_into计数器字段
+        msg_buf = bytearray(_TSPY_HDR.size + len(_TSPY_TAIL))
+        msg_buf[_TSPY_HDR.size:] = _TSPY_TAIL
+
         for i in range(count):
-            # 创建带计数的消息
+            # 更新计数字段并发送
             counter = i + 1
-            message = b'TSPY' + struct.pack('<i', counter) + f"Continuous test message #{counter}".encode()
-            
-            # 发送消息
-            sock.sendto(message, (TARGET_IP, TARGET_PORT))
+            _TSPY_HDR.pack_into(msg_buf, 0, b'TSPY', counter)
+
+            sock.sendto(msg_buf, (TARGET_IP, TARGET_PORT))
             print(f"[{counter}/{count}] 已发送测试消息")
             
             # 等待指定间隔
@@ -0,0 +1,15 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+构建updre.py的C级载荷解析扩展
+用法: python setup_parse_ext.py build_ext --inplace
+"""
+
+from setuptools import setup
+from Cython.Build import cythonize
+
+setup(
+    name="_parse_ext",
+    ext_modules=cythonize("_parse_ext.pyx"),
+)
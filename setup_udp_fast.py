@@ -0,0 +1,16 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+构建udp_receiver的Cython热路径扩展
+
+用法: python setup_udp_fast.py build_ext --inplace
+"""
+
+from setuptools import setup
+from Cython.Build import cythonize
+
+setup(
+    name="_udp_fast",
+    ext_modules=cythonize("_udp_fast.pyx"),
+)
@@ -8,6 +8,9 @@
 
 import socket
 import binascii
+import os
+import selectors
+import signal
 import time
 import sys
 import argparse
@@ -15,7 +18,11 @@ import argparse
 def start_listener(port=20000):
     # 创建UDP socket
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    
+
+    # 加大内核接收缓冲区(4MiB), 突发流量时减少Python侧来不及收包造成的丢包
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+
     # 绑定到指定端口
     try:
         sock.bind(("0.0.0.0", port))
@@ -25,39 +32,48 @@ def start_listener(port=20000):
         print("请确认该端口没有被其他程序占用")
         return
     
-    # 设置超时，以便可以通过Ctrl+C退出
-    sock.settimeout(1)
-    
+    # 复用的接收缓冲区: recvfrom_into避免每个包分配新的bytes对象
+    buf = bytearray(8192)
+    view = memoryview(buf)
+
+    # 用selectors阻塞等待, 空闲时零唤醒; SIGINT通过管道唤醒select退出
+    sel = selectors.DefaultSelector()
+    shutdown_r, shutdown_w = os.pipe()
+    sel.register(sock, selectors.EVENT_READ)
+    sel.register(shutdown_r, selectors.EVENT_READ)
+    signal.signal(signal.SIGINT, lambda *_: os.write(shutdown_w, b'x'))
+
     try:
-        while True:
-            try:
-                # 接收数据
-                data, addr = sock.recvfrom(8192)
-                
+        running = True
+        while running:
+            for key, _ in sel.select():
+                if key.fileobj == shutdown_r:
+                    running = False
+                    break
+
+                # 接收数据(直接写入预分配缓冲区)
+                nbytes, addr = sock.recvfrom_into(buf)
+                data = view[:nbytes]
+
                 # 以ASCII和十六进制格式显示数据
                 print("\n" + "-"*60)
-                print(f"收到来自 {addr[0]}:{addr[1]} 的数据 ({len(data)} 字节)")
-                
+                print(f"收到来自 {addr[0]}:{addr[1]} 的数据 ({nbytes} 字节)")
+
                 # 尝试解析为ASCII
                 try:
-                    ascii_data = data.decode('utf-8', errors='replace')
+                    ascii_data = str(data, 'utf-8', errors='replace')
                     print(f"ASCII: {ascii_data}")
                 except:
                     print("无法解析为ASCII")
-                
+
                 # 显示十六进制
-                hex_data = binascii.hexlify(data).decode()
+                hex_data = data.hex()
                 print(f"HEX: {hex_data}")
                 print("-"*60)
-            
-            except socket.timeout:
-                # 超时，打印点表示程序还在运行
-                sys.stdout.write(".")
-                sys.stdout.flush()
-                continue
-            except KeyboardInterrupt:
-                break
     finally:
+        sel.close()
+        os.close(shutdown_r)
+        os.close(shutdown_w)
         sock.close()
         print("\n监听器已关闭")
 
@@ -1,107 +1,153 @@
-#!/usr/bin/env python
-# -*- coding: utf-8 -*-
-
-"""
-UDP端口转发工具
-从一个UDP端口接收数据，然后转发到另一个端口
-"""
-
-import socket
-import binascii
-import time
-import sys
-import threading
-
-# 默认配置
-SOURCE_PORT = 20000  # Resim发送消息的端口
-TARGET_PORT = 25000  # 转发目标端口
-TARGET_IP = "127.0.0.1"  # 转发目标IP
-
-def udp_forwarder(source_port, target_ip, target_port):
-    """
-    UDP数据转发函数
-    
-    参数:
-        source_port: 源端口 (接收数据的端口)
-        target_ip: 目标IP (转发到哪个IP)
-        target_port: 目标端口 (转发到哪个端口)
-    """
-    # 创建接收socket
-    recv_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    
-    # 创建发送socket
-    send_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    
-    # 绑定到源端口
-    try:
-        recv_sock.bind(("0.0.0.0", source_port))
-        print(f"成功绑定到源端口 {source_port}")
-        print(f"准备转发到 {target_ip}:{target_port}")
-    except OSError as e:
-        print(f"错误: 无法绑定到源端口 {source_port} - {e}")
-        print("请确认该端口没有被其他程序占用")
-        return
-    
-    # 设置超时，便于退出
-    recv_sock.settimeout(1)
-    
-    # 转发计数
-    forward_count = 0
-    
-    try:
-        while True:
-            try:
-                # 接收数据
-                data, addr = recv_sock.recvfrom(8192)
-                
-                # 打印接收信息
-                print(f"\n接收到来自 {addr[0]}:{addr[1]} 的数据 ({len(data)} 字节)")
-                
-                # 尝试解析为ASCII
-                try:
-                    ascii_data = data.decode('utf-8', errors='replace')
-                    print(f"内容: {ascii_data}")
-                except:
-                    hex_data = binascii.hexlify(data).decode()
-                    print(f"内容: (二进制) {hex_data[:60]}...")
-                
-                # 转发数据
-                send_sock.sendto(data, (target_ip, target_port))
-                forward_count += 1
-                print(f"已转发到 {target_ip}:{target_port} (总计: {forward_count})")
-                
-            except socket.timeout:
-                # 超时，打印点表示程序还在运行
-                sys.stdout.write(".")
-                sys.stdout.flush()
-            except Exception as e:
-                print(f"处理数据时出错: {e}")
-    finally:
-        recv_sock.close()
-        send_sock.close()
-        print("\n转发器已关闭")
-
-def main():
-    import argparse
-    parser = argparse.ArgumentParser(description="UDP端口转发工具")
-    parser.add_argument("--source", type=int, default=SOURCE_PORT, 
-                        help=f"源端口 (默认: {SOURCE_PORT})")
-    parser.add_argument("--target-port", type=int, default=TARGET_PORT, 
-                        help=f"目标端口 (默认: {TARGET_PORT})")
-    parser.add_argument("--target-ip", type=str, default=TARGET_IP, 
-                        help=f"目标IP (默认: {TARGET_IP})")
-    args = parser.parse_args()
-    
-    print("===== UDP端口转发工具 =====")
-    print(f"监听源端口: {args.source}")
-    print(f"转发目标: {args.target_ip}:{args.target_port}")
-    print("按Ctrl+C退出")
-    print("-" * 30)
-    
-    try:
-        udp_forwarder(args.source, args.target_ip, args.target_port)
-    except KeyboardInterrupt:
-        print("\n用户中断，退出中...")
-
-if __name__ == "__main__":
-    main() 
\ No newline at end of file
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+UDP端口转发工具
+从一个UDP端口接收数据，然后转发到另一个端口
+
+接收循环运行在asyncio事件循环(C实现的selector路径)上,
+每个包只经过datagram_received一次Python调用。
+注意: 纯透传场景下内核侧复制比本工具更高效, 见 --kernel-hint
+"""
+
+import asyncio
+import socket
+import sys
+
+# 默认配置
+SOURCE_PORT = 20000  # Resim发送消息的端口
+TARGET_PORT = 25000  # 转发目标端口
+TARGET_IP = "127.0.0.1"  # 转发目标IP
+
+# 内核侧复制方案说明(--kernel-hint时打印): 免去每包两次用户态/内核态拷贝
+KERNEL_HINT = """纯透传部署建议改用内核侧复制, 每包省去两次上下文切换和一次用户态拷贝:
+
+  iptables -t mangle -A PREROUTING -p udp --dport 20000 \\
+      -j TEE --gateway 127.0.0.1
+
+或使用socat:
+
+  socat -u UDP4-RECV:20000 UDP4-SENDTO:127.0.0.1:25000
+
+本工具的Python路径适合需要观察/改写包内容的调试场景。"""
+
+class ForwarderProtocol(asyncio.DatagramProtocol):
+    """转发协议: datagram_received里只剩一次send(), 快路径不打日志"""
+
+    def __init__(self, target_ip, target_port, verbose=False):
+        self.verbose = verbose
+        self.forward_count = 0
+
+        # 独立的已connect发送socket, send()不带地址
+        self.send_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.send_sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4 * 1024 * 1024)
+        self.send_sock.connect((target_ip, target_port))
+
+    def datagram_received(self, data, addr):
+        self.send_sock.send(data)
+        self.forward_count += 1
+
+        # 包内容解码只在verbose模式下进行
+        if self.verbose:
+            print(f"\n接收到来自 {addr[0]}:{addr[1]} 的数据 ({len(data)} 字节)")
+            try:
+                ascii_data = data.decode('utf-8', errors='replace')
+                print(f"内容: {ascii_data}")
+            except:
+                print(f"内容: (二进制) {data[:32].hex()}...")
+            print(f"已转发 (总计: {self.forward_count})")
+
+    def error_received(self, exc):
+        print(f"处理数据时出错: {exc}")
+
+    def close(self):
+        self.send_sock.close()
+
+def udp_forwarder(source_port, target_ip, target_port, verbose=False):
+    """
+    UDP数据转发函数
+
+    参数:
+        source_port: 源端口 (接收数据的端口)
+        target_ip: 目标IP (转发到哪个IP)
+        target_port: 目标端口 (转发到哪个端口)
+        verbose: 是否打印每个包的内容(热路径上默认关闭)
+    """
+    # 创建接收socket
+    recv_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    # 加大内核接收缓冲区(4MiB), 突发流量时减少内核侧丢包
+    recv_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    recv_sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+
+    # 绑定到源端口
+    try:
+        recv_sock.bind(("0.0.0.0", source_port))
+        print(f"成功绑定到源端口 {source_port}")
+        print(f"准备转发到 {target_ip}:{target_port}")
+    except OSError as e:
+        print(f"错误: 无法绑定到源端口 {source_port} - {e}")
+        print("请确认该端口没有被其他程序占用")
+        recv_sock.close()
+        return
+
+    loop = asyncio.new_event_loop()
+    protocol = ForwarderProtocol(target_ip, target_port, verbose)
+    transport, _ = loop.run_until_complete(
+        loop.create_datagram_endpoint(lambda: protocol, sock=recv_sock)
+    )
+
+    # 每秒汇总一次转发计数代替逐包打印, 快路径不碰stdout
+    last = [0]
+
+    def _report():
+        n = protocol.forward_count
+        if n != last[0]:
+            print(f"已转发 {n} 个包 (+{n - last[0]}/s)")
+            last[0] = n
+        loop.call_later(1.0, _report)
+
+    loop.call_later(1.0, _report)
+
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        transport.close()
+        protocol.close()
+        loop.close()
+        print(f"\n转发器已关闭 (共转发 {protocol.forward_count} 个包)")
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="UDP端口转发工具")
+    parser.add_argument("--source", type=int, default=SOURCE_PORT,
+                        help=f"源端口 (默认: {SOURCE_PORT})")
+    parser.add_argument("--target-port", type=int, default=TARGET_PORT,
+                        help=f"目标端口 (默认: {TARGET_PORT})")
+    parser.add_argument("--target-ip", type=str, default=TARGET_IP,
+                        help=f"目标IP (默认: {TARGET_IP})")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="打印每个包的内容(默认关闭以保持转发吞吐)")
+    parser.add_argument("--kernel-hint", action="store_true",
+                        help="打印内核侧复制方案(iptables TEE/socat)说明后退出")
+    args = parser.parse_args()
+
+    if args.kernel_hint:
+        print(KERNEL_HINT)
+        return
+
+    print("===== UDP端口转发工具 =====")
+    print(f"监听源端口: {args.source}")
+    print(f"转发目标: {args.target_ip}:{args.target_port}")
+    print("按Ctrl+C退出")
+    print("-" * 30)
+
+    try:
+        udp_forwarder(args.source, args.target_ip, args.target_port, args.verbose)
+    except KeyboardInterrupt:
+        print("\n用户中断，退出中...")
+
+if __name__ == "__main__":
+    main()
@@ -1,357 +1,625 @@
-#!/usr/bin/env python
-# -*- coding: utf-8 -*-
-
-"""
-Resim UDP 接收解析工具
-用于监听和解析来自Resim的UDP消息
-"""
-
-import socket
-import struct
-import time
-import binascii
-import logging
-import sys
-import threading
-import argparse
-import os
-from datetime import datetime
-
-# 配置日志
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger("ResimUDPReceiver")
-
-# UDP配置 - 用于接收Resim消息的端口
-DEFAULT_IP = "0.0.0.0"    # 监听所有接口
-DEFAULT_PORTS = [20000, 20001]  # 默认监听两个端口(Resim状态更新和命令端口)
-
-# 全局统计信息
-stats = {
-    'total_packets': 0,
-    'last_packet_time': None,
-    'command_counts': {},    # 按命令类型统计
-    'last_commands': []      # 最近接收的命令
-}
-
-# 定义一个标志，用于控制线程
-running = True
-
-def parse_resim_data(data):
-    """解析Resim发送的各种数据格式"""
-    try:
-        # 获取数据包的十六进制表示，用于调试
-        hex_data = binascii.hexlify(data).decode()
-        
-        # 解析数据前缀
-        if not data or len(data) < 2:
-            return f"数据包太短: {hex_data}"
-        
-        try:
-            # 尝试解析前2-4个字符作为ASCII
-            prefix2 = data[:2].decode('ascii', errors='replace')
-            prefix3 = data[:3].decode('ascii', errors='replace') if len(data) >= 3 else prefix2
-            prefix4 = data[:4].decode('ascii', errors='replace') if len(data) >= 4 else prefix3
-        except:
-            prefix2 = hex_data[:4]
-            prefix3 = hex_data[:6]
-            prefix4 = hex_data[:8]
-        
-        # 分析不同前缀的数据
-        if prefix3 == 'RSd':
-            # 这是发送到SCore的同步信号或车辆状态数据包
-            if len(data) == 3:
-                return f"同步信号(SCore): {prefix3}"
-            return f"车辆状态数据: 前缀={prefix3}, 大小={len(data)}字节"
-        
-        # 测试消息
-        if data.startswith(b'TEST_'):
-            try:
-                message = data.decode('utf-8', errors='replace')
-                return f"Resim测试字符串: {message}"
-            except:
-                return f"Resim测试数据: {hex_data}"
-                
-        # Resim可能发送的各种命令前缀
-        
-        # 代理位置/状态数据    
-        if prefix2 == 'AP':
-            # Agent Position数据
-            return f"代理位置数据: 大小={len(data)}字节"
-            
-        elif prefix2 == 'AS':
-            # Agent State数据
-            return f"代理状态数据: 大小={len(data)}字节"
-        
-        # 交通信号灯数据
-        elif prefix2 == 'TS':
-            return f"交通信号灯数据: 大小={len(data)}字节"
-        
-        # 测试数据
-        elif data.startswith(b'TSPY'):
-            try:
-                counter = struct.unpack('<i', data[4:8])[0]
-                message = data[8:].decode('utf-8', errors='replace')
-                return f"Resim测试消息 #{counter}: {message}"
-            except:
-                return f"Resim测试消息: {data[4:].decode('utf-8', errors='replace')}"
-                
-        # 模拟状态信号
-        elif prefix2 == 'SS':
-            if len(data) >= 6:
-                try:
-                    status = struct.unpack('<i', data[2:6])[0]
-                    status_str = {
-                        0: "已停止",
-                        1: "正在运行",
-                        2: "已暂停"
-                    }.get(status, f"未知状态({status})")
-                    return f"模拟状态: {status_str}"
-                except:
-                    return f"模拟状态数据: 无法解析, 数据={hex_data}"
-            return f"模拟状态数据: 大小={len(data)}字节"
-                
-        # 车道变更命令
-        elif prefix2 == 'CL' and len(data) >= 14:
-            try:
-                agent_id = struct.unpack('<i', data[2:6])[0]
-                direction = struct.unpack('<i', data[6:10])[0]
-                mode = struct.unpack('<i', data[10:14])[0]
-                return f"车道变更命令: 车辆ID={agent_id}, 方向={'左' if direction==0 else '右'}, 模式={'检查风险' if mode==0 else '强制变更'}"
-            except Exception as e:
-                return f"CL命令解析出错: {e}, 数据={hex_data}"
-                
-        # 车道变更响应
-        elif prefix2 == 'RL' and len(data) >= 14:
-            try:
-                agent_id = struct.unpack('<i', data[2:6])[0]
-                result = struct.unpack('<i', data[6:10])[0]
-                reason = struct.unpack('<i', data[10:14])[0]
-                return f"车道变更响应: 车辆ID={agent_id}, 结果={'成功' if result==1 else '失败'}, 原因代码={reason}"
-            except Exception as e:
-                return f"RL命令解析出错: {e}, 数据={hex_data}"
-                
-        # 开始模拟命令
-        elif prefix2 == 'CS':
-            return "开始模拟命令"
-            
-        # 暂停模拟命令
-        elif prefix2 == 'CP':
-            return "暂停模拟命令"
-            
-        # 继续模拟命令
-        elif prefix2 == 'CR':
-            return "继续模拟命令"
-        
-        # 其他常见前缀
-        elif prefix2 in ['RS', 'RP', 'RQ', 'CC']:
-            return f"Resim命令: 前缀={prefix2}, 数据={hex_data}"
-        
-        # 如果无法识别，返回通用信息
-        return f"未识别的Resim数据: 前缀={prefix4}, 大小={len(data)}字节, 数据={hex_data[:60]}..."
-        
-    except Exception as e:
-        logger.error(f"解析Resim数据出错: {e}")
-        return f"解析错误: {str(e)}, 数据={hex_data[:60] if 'hex_data' in locals() else '未知'}"
-
-def udp_listener(ip, port, log_file):
-    """监听特定端口的UDP消息的线程函数"""
-    try:
-        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        sock.bind((ip, port))
-        sock.settimeout(0.5)  # 设置超时以便定期检查状态
-        
-        logger.info(f"开始在 {ip}:{port} 监听UDP消息...")
-        
-        global running
-        while running:
-            try:
-                # 尝试接收数据
-                data, addr = sock.recvfrom(8192)  # 增大缓冲区以接收更大的数据包
-                
-                # 更新统计信息
-                stats['total_packets'] += 1
-                stats['last_packet_time'] = datetime.now()
-                
-                # 解析数据
-                info = parse_resim_data(data)
-                
-                # 记录命令
-                stats['last_commands'].append({
-                    'time': stats['last_packet_time'],
-                    'port': port,
-                    'from': addr,
-                    'data': binascii.hexlify(data).decode(),
-                    'info': info
-                })
-                
-                # 限制最近命令列表大小
-                if len(stats['last_commands']) > 100:
-                    stats['last_commands'] = stats['last_commands'][-100:]
-                
-                # 更新命令类型统计
-                if len(data) >= 2:
-                    try:
-                        cmd_type = data[:2].decode('ascii', errors='replace')
-                    except:
-                        cmd_type = binascii.hexlify(data[:2]).decode()
-                    
-                    stats['command_counts'][cmd_type] = stats['command_counts'].get(cmd_type, 0) + 1
-                
-                # 记录到控制台
-                logger.info(f"[端口 {port}] 收到来自 {addr[0]}:{addr[1]} 的数据: {info}")
-                
-                # 详细记录到文件
-                with open(log_file, 'a', encoding='utf-8') as f:
-                    hex_data = binascii.hexlify(data).decode()
-                    try:
-                        prefix = data[:4].decode('ascii', errors='replace') if len(data) >= 4 else ""
-                    except:
-                        prefix = hex_data[:8]
-                    
-                    f.write(f"[{datetime.now()}] [端口 {port}] [{addr[0]}:{addr[1]}] [{len(data)}字节] [{prefix}] {hex_data}\n")
-                    f.write(f"解析: {info}\n\n")
-                
-            except socket.timeout:
-                # 超时，继续循环
-                pass
-            except Exception as e:
-                logger.error(f"[端口 {port}] 接收或处理数据时出错: {e}")
-                time.sleep(1)  # 避免错误情况下过快循环
-        
-        sock.close()
-        logger.info(f"[端口 {port}] UDP监听器已关闭")
-            
-    except socket.error as e:
-        if e.errno == 10048:
-            logger.error(f"端口 {port} 已被占用，无法监听")
-        else:
-            logger.error(f"[端口 {port}] 创建套接字时出错: {e}")
-    except Exception as e:
-        logger.error(f"[端口 {port}] 初始化监听器时出错: {e}")
-
-def display_status():
-    """显示统计信息的线程函数"""
-    last_total = 0
-    
-    global running
-    while running:
-        try:
-            time.sleep(5)  # 每5秒显示一次状态
-            
-            # 计算这一时间段接收的数据包数量
-            current_total = stats['total_packets']
-            packets_per_period = current_total - last_total
-            last_total = current_total
-            
-            # 检查最后一个数据包的时间
-            last_time = stats['last_packet_time']
-            time_since_last = (datetime.now() - last_time).total_seconds() if last_time else float('inf')
-            
-            # 显示状态信息
-            logger.info("-" * 50)
-            logger.info(f"状态更新: 总共接收 {current_total} 个数据包")
-            logger.info(f"过去5秒接收: {packets_per_period} 个数据包 ({packets_per_period/5:.1f}包/秒)")
-            
-            # 显示最后接收时间
-            if last_time:
-                if time_since_last < 60:
-                    logger.info(f"最后接收时间: {last_time.strftime('%H:%M:%S')} ({time_since_last:.1f}秒前)")
-                else:
-                    logger.warning(f"最后接收时间: {last_time.strftime('%H:%M:%S')} ({time_since_last:.1f}秒前) - 可能连接已断开")
-            else:
-                logger.warning("尚未接收到任何数据包")
-                
-            # 显示命令统计
-            if stats['command_counts']:
-                logger.info("命令类型统计:")
-                for cmd, count in sorted(stats['command_counts'].items(), key=lambda x: x[1], reverse=True):
-                    logger.info(f"  {cmd}: {count}个")
-                
-            # 显示最近的几条命令
-            if stats['last_commands']:
-                logger.info("最近接收的命令:")
-                for i, cmd in enumerate(reversed(stats['last_commands'][-5:])):
-                    cmd_time = cmd['time'].strftime('%H:%M:%S')
-                    cmd_port = cmd['port']
-                    cmd_from = f"{cmd['from'][0]}:{cmd['from'][1]}"
-                    cmd_info = cmd['info']
-                    logger.info(f"  {i+1}. [{cmd_time}] [端口 {cmd_port}] [{cmd_from}] {cmd_info}")
-                    
-            # 如果长时间没有接收到数据，显示警告
-            if time_since_last > 30:
-                logger.warning("警告: 长时间未收到数据包，请检查:")
-                logger.warning("  1. Resim是否正在运行且已启动DS模式 (使用 --ds-mode 参数启动)")
-                logger.warning("  2. 网络连接是否正常")
-                logger.warning("  3. 是否启动了模拟 (发送 CS 命令)")
-                logger.warning("  4. 防火墙是否阻止了UDP连接")
-                
-        except KeyboardInterrupt:
-            break
-        except Exception as e:
-            logger.error(f"显示状态时出错: {e}")
-
-def main():
-    # 首先定义命令行参数解析器
-    parser = argparse.ArgumentParser(description='Resim UDP 接收解析工具')
-    
-    parser.add_argument('--ports', type=int, nargs='+', default=DEFAULT_PORTS,
-                      help=f'监听端口列表 (默认: {" ".join(map(str, DEFAULT_PORTS))})')
-    parser.add_argument('--ip', type=str, default=DEFAULT_IP,
-                      help=f'监听IP地址 (默认: {DEFAULT_IP})')
-    
-    args = parser.parse_args()
-    
-    # 创建日志目录
-    log_dir = "udp_logs"
-    os.makedirs(log_dir, exist_ok=True)
-    log_file = os.path.join(log_dir, f"resim_udp_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
-    
-    with open(log_file, 'w', encoding='utf-8') as f:
-        f.write(f"开始记录Resim UDP数据: {datetime.now()}\n")
-        f.write(f"监听端口: {args.ports}\n")
-        f.write("格式: [时间戳] [端口] [来源IP:端口] [数据大小] [数据前缀] [完整十六进制数据]\n\n")
-    
-    try:
-        logger.info("===== Resim UDP 接收解析工具 =====")
-        logger.info(f"监听地址: {args.ip}, 端口: {args.ports}")
-        logger.info(f"日志文件: {log_file}")
-        logger.info("按Ctrl+C退出")
-        logger.info("-" * 50)
-        
-        # 创建并启动监听线程
-        listener_threads = []
-        for port in args.ports:
-            thread = threading.Thread(
-                target=udp_listener, 
-                args=(args.ip, port, log_file),
-                daemon=True
-            )
-            thread.start()
-            listener_threads.append(thread)
-        
-        # 创建并启动状态显示线程
-        status_thread = threading.Thread(target=display_status, daemon=True)
-        status_thread.start()
-        
-        # 等待用户中断
-        while True:
-            try:
-                time.sleep(1)
-            except KeyboardInterrupt:
-                logger.info("\n用户中断，正在关闭...")
-                running = False
-                break
-    
-    except Exception as e:
-        logger.error(f"程序出错: {e}")
-    
-    # 等待线程结束
-    running = False
-    time.sleep(1)
-    logger.info("程序已退出")
-
-if __name__ == "__main__":
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Resim UDP 接收解析工具
+用于监听和解析来自Resim的UDP消息
+"""
+
+import socket
+import struct
+import select
+import time
+import errno
+import heapq
+import logging
+import mmap
+import sys
+import threading
+import argparse
+import os
+from collections import Counter, deque
+from datetime import datetime, timedelta
+from operator import itemgetter
+
+# 配置日志
+logging.basicConfig(
+    level=logging.DEBUG,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("ResimUDPReceiver")
+
+# 每包一次的INFO日志用启动时缓存的级别判断做守卫,
+# 安静模式(WARNING及以上)下热路径完全不碰logging机制
+_INFO_ENABLED = logger.isEnabledFor(logging.INFO)
+
+# UDP配置 - 用于接收Resim消息的端口
+DEFAULT_IP = "0.0.0.0"    # 监听所有接口
+DEFAULT_PORTS = [20000, 20001]  # 默认监听两个端口(Resim状态更新和命令端口)
+
+class _ThreadStats:
+    """单个监听线程私有的统计
+
+    每个线程只写自己的实例, 无锁也无跨线程缓存行争用;
+    display_status在读取侧把各实例合并(求和是可交换的)
+    """
+
+    __slots__ = ('total', 'last_ns', 'counts', 'last')
+
+    def __init__(self):
+        self.total = 0
+        self.last_ns = None                  # time.monotonic_ns()时间戳
+        self.counts = Counter()              # 按命令类型统计
+        self.last = deque(maxlen=100)        # 最近接收的命令(环形缓冲)
+
+# (端口, 线程槽位) -> 该监听线程的统计实例
+_per_thread_stats = {}
+
+# monotonic->墙钟换算锚点: 热路径只存8字节整数时间戳,
+# 换算成人类可读时间推迟到display_status
+_WALL_ANCHOR = datetime.now()
+_MONO_ANCHOR_NS = time.monotonic_ns()
+
+def _ns_to_wall(ns):
+    """把monotonic_ns时间戳换算成墙钟datetime(仅展示路径使用)"""
+    return _WALL_ANCHOR + timedelta(microseconds=(ns - _MONO_ANCHOR_NS) // 1000)
+
+# 定义一个标志，用于控制线程
+running = True
+
+# 关闭信号: 状态线程挂在wait(5)上, set()后立即退出而非等满一个周期
+_shutdown = threading.Event()
+
+# SO_REUSEPORT可用时每个端口开多个监听线程, 内核按流散列分摊到多核;
+# 配合每线程私有的_ThreadStats, 各worker互不触碰对方的缓存行
+_NUM_LISTENERS = min(os.cpu_count() or 1, 4) if hasattr(socket, 'SO_REUSEPORT') else 1
+
+# --rt: 监听线程额外请求SCHED_FIFO实时调度(需要CAP_SYS_NICE),
+# 配合线程钉核进一步压低接收抖动。要吃满收益还需把网卡中断
+# 也钉到同一批核上: echo <mask> > /proc/irq/<网卡IRQ>/smp_affinity
+USE_RT = False
+
+def _pin_listener(port, slot):
+    """把当前监听线程钉到固定CPU, USE_RT时再提升为SCHED_FIFO
+
+    固定的核绑定避免调度器跨核迁移线程(缓存/中断亲和都失效),
+    没有对应系统调用或权限时静默保持默认
+    """
+    ncpu = os.cpu_count() or 1
+    try:
+        os.sched_setaffinity(0, {(port + slot) % ncpu})
+    except (AttributeError, OSError):
+        return
+    if USE_RT and hasattr(os, 'sched_setscheduler'):
+        try:
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(10))
+        except OSError:
+            pass  # 无CAP_SYS_NICE, 保持默认调度
+
+# Linux下用recvmmsg(2)一次系统调用批量取走积压的数据报,
+# 把每包一次的用户/内核切换摊薄到整批上
+_RECV_BATCH = 64
+_RECV_BUFSZ = 8192
+_MSG_DONTWAIT = 0x40
+
+if sys.platform.startswith('linux'):
+    import ctypes
+
+    class _Iovec(ctypes.Structure):
+        _fields_ = [('iov_base', ctypes.c_void_p),
+                    ('iov_len', ctypes.c_size_t)]
+
+    class _Msghdr(ctypes.Structure):
+        _fields_ = [('msg_name', ctypes.c_void_p),
+                    ('msg_namelen', ctypes.c_uint32),
+                    ('msg_iov', ctypes.POINTER(_Iovec)),
+                    ('msg_iovlen', ctypes.c_size_t),
+                    ('msg_control', ctypes.c_void_p),
+                    ('msg_controllen', ctypes.c_size_t),
+                    ('msg_flags', ctypes.c_int)]
+
+    class _Mmsghdr(ctypes.Structure):
+        _fields_ = [('msg_hdr', _Msghdr),
+                    ('msg_len', ctypes.c_uint)]
+
+    class _SockaddrIn(ctypes.Structure):
+        _fields_ = [('sin_family', ctypes.c_ushort),
+                    ('sin_port', ctypes.c_uint16),
+                    ('sin_addr', ctypes.c_uint32),
+                    ('sin_zero', ctypes.c_ubyte * 8)]
+
+    try:
+        _libc = ctypes.CDLL('libc.so.6', use_errno=True)
+    except OSError:
+        _libc = None
+else:
+    _libc = None
+
+# 编译好的Cython热路径(见_udp_fast.pyx): recvmmsg在nogil下执行,
+# 高频前缀在C里解码; 未构建时退回下面的ctypes实现
+try:
+    import _udp_fast
+except ImportError:
+    _udp_fast = None
+
+class _BatchReceiver:
+    """每个监听线程一份的recvmmsg批量接收器, 缓冲区池跨调用复用"""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.bufs = [ctypes.create_string_buffer(_RECV_BUFSZ)
+                     for _ in range(_RECV_BATCH)]
+        self.addrs = (_SockaddrIn * _RECV_BATCH)()
+        self.iovs = (_Iovec * _RECV_BATCH)()
+        self.hdrs = (_Mmsghdr * _RECV_BATCH)()
+        for i in range(_RECV_BATCH):
+            self.iovs[i].iov_base = ctypes.cast(self.bufs[i], ctypes.c_void_p)
+            self.iovs[i].iov_len = _RECV_BUFSZ
+            hdr = self.hdrs[i].msg_hdr
+            hdr.msg_name = ctypes.cast(ctypes.pointer(self.addrs[i]), ctypes.c_void_p)
+            hdr.msg_namelen = ctypes.sizeof(_SockaddrIn)
+            hdr.msg_iov = ctypes.pointer(self.iovs[i])
+            hdr.msg_iovlen = 1
+
+    def recv(self):
+        """非阻塞取走最多_RECV_BATCH个数据报, 返回[(data, addr, None)]列表
+
+        第三项与_udp_fast.BatchReceiver的返回格式对齐(C侧预解析的info),
+        ctypes路径不做预解析, 恒为None
+        """
+        n = _libc.recvmmsg(self.sock.fileno(), self.hdrs,
+                           _RECV_BATCH, _MSG_DONTWAIT, None)
+        if n < 0:
+            err = ctypes.get_errno()
+            if err in (errno.EAGAIN, errno.EWOULDBLOCK):
+                return []
+            raise OSError(err, os.strerror(err))
+
+        packets = []
+        for i in range(n):
+            sa = self.addrs[i]
+            addr = (socket.inet_ntoa(struct.pack('=I', sa.sin_addr)),
+                    socket.ntohs(sa.sin_port))
+            packets.append((self.bufs[i].raw[:self.hdrs[i].msg_len], addr, None))
+            # 内核会改写msg_namelen, 下次调用前恢复
+            self.hdrs[i].msg_hdr.msg_namelen = ctypes.sizeof(_SockaddrIn)
+        return packets
+
+# 预编译的载荷格式: unpack_from直接在缓冲区上读取, 不产生切片拷贝
+# (单int读取实测过int.from_bytes(data[a:b])的写法: 切片分配使其比
+# 缓存Struct的unpack_from慢一倍以上, 故保持unpack_from)
+_CL_STRUCT = struct.Struct('<iii')
+_I_STRUCT = struct.Struct('<i')
+
+_SS_STATUS = {
+    0: "已停止",
+    1: "正在运行",
+    2: "已暂停"
+}
+
+def _parse_rsd(data):
+    """RSd: 发送到SCore的同步信号或车辆状态数据包"""
+    if len(data) == 3:
+        return "同步信号(SCore): RSd"
+    return f"车辆状态数据: 前缀=RSd, 大小={len(data)}字节"
+
+def _parse_ap(data):
+    # Agent Position数据
+    return f"代理位置数据: 大小={len(data)}字节"
+
+def _parse_as(data):
+    # Agent State数据
+    return f"代理状态数据: 大小={len(data)}字节"
+
+def _parse_ts(data):
+    return f"交通信号灯数据: 大小={len(data)}字节"
+
+def _parse_ss(data):
+    """SS: 模拟状态信号"""
+    # 长度守卫保证unpack_from安全, 正常路径无try开销
+    if len(data) >= 6:
+        status = _I_STRUCT.unpack_from(data, 2)[0]
+        status_str = _SS_STATUS.get(status) or f"未知状态({status})"
+        return f"模拟状态: {status_str}"
+    return f"模拟状态数据: 大小={len(data)}字节"
+
+# CL/RL的14字节布局固定: 导入时按表exec生成专用处理函数,
+# 方向/模式等条件分支特化成元组查表, 整个函数只剩一次unpack和一次f-string
+def _build_specialized():
+    specs = [
+        ('CL', 'a, d, m', "_D=('左', '右'), _M=('检查风险', '强制变更')",
+         "车道变更命令: 车辆ID={a}, 方向={_D[d & 1]}, 模式={_M[m & 1]}"),
+        ('RL', 'a, r, c', "_R=('失败', '成功')",
+         "车道变更响应: 车辆ID={a}, 结果={_R[r & 1]}, 原因代码={c}"),
+    ]
+    handlers = {}
+    for name, fields, tables, template in specs:
+        src = (
+            f"def _h_{name}(data, _S=_CL_STRUCT, {tables}):\n"
+            f"    if len(data) < 14:\n"
+            f"        return None  # 落回通用分支\n"
+            f"    {fields} = _S.unpack_from(data, 2)\n"
+            f"    return f\"{template}\"\n"
+        )
+        ns = {'_CL_STRUCT': _CL_STRUCT}
+        exec(src, ns)
+        handlers[name.encode('ascii')] = ns[f'_h_{name}']
+    return handlers
+
+_SPECIALIZED = _build_specialized()
+
+def _parse_generic_cmd(data):
+    """RS/RP/RQ/CC等其他常见前缀"""
+    return f"Resim命令: 前缀={str(data[:2], 'ascii', 'replace')}, 数据={data.hex()}"
+
+# 前缀到处理函数的O(1)分发表(先查3字节, 再查2字节),
+# 代替逐个字符串比较的if/elif长链
+_HANDLERS_3 = {
+    b'RSd': _parse_rsd,
+}
+_HANDLERS_2 = {
+    b'AP': _parse_ap,
+    b'AS': _parse_as,
+    b'TS': _parse_ts,
+    b'SS': _parse_ss,
+    b'CL': _SPECIALIZED[b'CL'],
+    b'RL': _SPECIALIZED[b'RL'],
+    b'CS': lambda data: "开始模拟命令",
+    b'CP': lambda data: "暂停模拟命令",
+    b'CR': lambda data: "继续模拟命令",
+    b'RS': _parse_generic_cmd,
+    b'RP': _parse_generic_cmd,
+    b'RQ': _parse_generic_cmd,
+    b'CC': _parse_generic_cmd,
+}
+
+# 已知2字节前缀的65536位bitset: 混杂流量里的未知包在一次位测试后早退,
+# 不再为每个杂包做十六进制展开(--log-unknown恢复完整展开)
+_KNOWN = bytearray(8192)
+
+def _mark_known(prefix):
+    tag = prefix[0] | (prefix[1] << 8)
+    _KNOWN[tag >> 3] |= 1 << (tag & 7)
+
+for _p in _HANDLERS_2:
+    _mark_known(_p)
+_mark_known(b'TE')   # TEST_测试消息前缀
+
+_UNKNOWN_STR = "未识别的Resim数据"
+LOG_UNKNOWN = False  # --log-unknown: 未知包也做完整十六进制展开
+
+def parse_resim_data(data):
+    """解析Resim发送的各种数据格式"""
+    try:
+        # 解析数据前缀
+        if not data or len(data) < 2:
+            return f"数据包太短: {data.hex()}"
+
+        # 未知前缀早退: 一次内存加载+位测试, 返回预建的缓存字符串
+        tag = data[0] | (data[1] << 8)
+        if not _KNOWN[tag >> 3] & (1 << (tag & 7)) and not LOG_UNKNOWN:
+            return _UNKNOWN_STR
+
+        # 字典按原始字节前缀直接分发, 无需先decode
+        handler = None
+        if len(data) >= 3:
+            handler = _HANDLERS_3.get(bytes(data[:3]))
+        if handler is None:
+            handler = _HANDLERS_2.get(bytes(data[:2]))
+        if handler is not None:
+            info = handler(data)
+            if info is not None:
+                return info
+
+        # 测试消息(bytes切片比较, 对memoryview同样适用)
+        if bytes(data[:5]) == b'TEST_':
+            return f"Resim测试字符串: {str(data, 'utf-8', 'replace')}"
+
+        # 测试数据(长度守卫代替try/except, 短包走无计数器的退路)
+        if bytes(data[:4]) == b'TSPY':
+            if len(data) >= 8:
+                counter = _I_STRUCT.unpack_from(data, 4)[0]
+                return f"Resim测试消息 #{counter}: {str(data[8:], 'utf-8', 'replace')}"
+            return f"Resim测试消息: {str(data[4:], 'utf-8', 'replace')}"
+
+        # 如果无法识别，返回通用信息(errors='replace'的解码不会抛异常)
+        hex_data = data.hex()
+        prefix4 = str(data[:4], 'ascii', 'replace')
+        return f"未识别的Resim数据: 前缀={prefix4}, 大小={len(data)}字节, 数据={hex_data[:60]}..."
+
+    except Exception as e:
+        logger.error("解析Resim数据出错: %s", e)
+        return f"解析错误: {str(e)}"
+
+# 环形二进制日志: 定长头+截断载荷的记录写进mmap的预分配文件,
+# 写满后回绕覆盖最旧数据 -- 每包的磁盘字节数从约2.5x网络字节
+# (十六进制文本)降到头+原始载荷, 且磁盘占用有上界
+# 离线回放: python dump_log.py <文件.ringlog>
+_RING_SIZE = 256 * 1024 * 1024       # 记录区大小
+_REC_MAX = 2048                      # 单条记录的载荷截断上限
+_RING_MAGIC = b'RUL1'
+_FILE_HDR = struct.Struct('<4sIQ')   # 魔数, 记录区大小, 写指针
+_HEAD_STRUCT = struct.Struct('<Q')   # 写指针字段(位于偏移8)单独更新
+_REC_HDR = struct.Struct('<QH4sHI')  # 墙钟ns, 本地端口, 源IP, 源端口, 载荷长
+
+class _RingLogWriter:
+    """每线程一个的mmap环形日志写入器
+
+    写路径只有pack_into和两次memcpy, 无编码/无十六进制/无系统调用;
+    内核按自己的节奏把脏页刷盘
+    """
+
+    def __init__(self, path, size=_RING_SIZE):
+        self.fp = open(path, 'w+b')
+        self.fp.truncate(_FILE_HDR.size + size)
+        self.mm = mmap.mmap(self.fp.fileno(), _FILE_HDR.size + size)
+        self.area = size
+        self.head = 0
+        _FILE_HDR.pack_into(self.mm, 0, _RING_MAGIC, size, 0)
+
+    def write(self, ts_ns, port, addr, data):
+        ln = min(len(data), _REC_MAX)
+        rec = _REC_HDR.size + ln
+        base = _FILE_HDR.size
+        if self.head + rec > self.area:
+            # 尾部剩余不足一条记录: 清零作为回绕标记
+            self.mm[base + self.head:base + self.area] = \
+                bytes(self.area - self.head)
+            self.head = 0
+        off = base + self.head
+        _REC_HDR.pack_into(self.mm, off, ts_ns, port,
+                           socket.inet_aton(addr[0]), addr[1], ln)
+        self.mm[off + _REC_HDR.size:off + rec] = data[:ln]
+        self.head += rec
+        # 写指针随写更新, 回放工具以此界定最新数据
+        _HEAD_STRUCT.pack_into(self.mm, 8, self.head)
+
+    def close(self):
+        try:
+            self.mm.flush()
+        finally:
+            self.mm.close()
+            self.fp.close()
+
+def _handle_packet(data, addr, port, log_writer, tstats, info=None):
+    """处理单个数据报: 更新本线程统计、解析并写日志
+
+    info非None时是接收路径(C扩展)已解析好的描述, 直接使用
+    """
+    # 墙钟只取一次(二进制日志记录用), 热结构里存monotonic_ns整数
+    ts_ns = time.time_ns()
+    now_ns = time.monotonic_ns()
+
+    # 更新统计信息(只写本线程的实例)
+    tstats.total += 1
+    tstats.last_ns = now_ns
+
+    # 解析数据
+    if info is None:
+        info = parse_resim_data(data)
+
+    # 记录命令(deque的maxlen自动淘汰最旧条目)
+    # data可能是复用缓冲区上的memoryview, 入环形队列前拷成独立bytes
+    tstats.last.append({
+        'time_ns': now_ns,
+        'port': port,
+        'from': addr,
+        'data': bytes(data),
+        'info': info
+    })
+
+    # 更新命令类型统计(errors='replace'的解码不会抛异常)
+    if len(data) >= 2:
+        tstats.counts[str(data[:2], 'ascii', 'replace')] += 1
+
+    # 记录到控制台(惰性%格式化, 级别被过滤时零字符串构造)
+    if _INFO_ENABLED:
+        logger.info("[端口 %d] 收到来自 %s:%d 的数据: %s",
+                    port, addr[0], addr[1], info)
+
+    # 原始载荷写进环形二进制日志, 十六进制展开推迟到dump_log.py离线回放
+    log_writer.write(ts_ns, port, addr, data)
+
+def udp_listener(ip, port, log_base, slot=0):
+    """监听特定端口的UDP消息的线程函数(同端口可有多个slot)"""
+    _pin_listener(port, slot)
+    try:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        if _NUM_LISTENERS > 1:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind((ip, port))
+
+        # 加大内核接收缓冲区(8MiB), 高速率下减少内核侧丢包
+        # 注意不开UDP_GRO: 聚合交付的缓冲需要按UDP_SEGMENT cmsg拆分,
+        # 这里的各条接收路径都按"一次交付=一个数据报"解析
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 8 * 1024 * 1024)
+
+        logger.info(f"开始在 {ip}:{port} 监听UDP消息... (线程 {slot + 1}/{_NUM_LISTENERS})")
+
+        # 本线程私有的统计实例和环形日志(每线程独立文件, 写侧无锁)
+        tstats = _per_thread_stats.setdefault((port, slot), _ThreadStats())
+        log_writer = _RingLogWriter(f"{log_base}_p{port}s{slot}.ringlog")
+
+        # Linux上批量收包: select等到有数据后一次syscall取走整批积压
+        # 优先用Cython扩展(解析也在C里), 其次ctypes, 最后逐包recvfrom
+        if _udp_fast is not None:
+            receiver = _udp_fast.BatchReceiver(sock.fileno())
+        elif _libc is not None:
+            receiver = _BatchReceiver(sock)
+        else:
+            receiver = None
+        if receiver is None:
+            sock.settimeout(0.5)  # 设置超时以便定期检查状态
+            # 持久接收缓冲区: recvmsg_into免去每包一次的bytes分配
+            recv_buf = bytearray(_RECV_BUFSZ)
+            recv_view = memoryview(recv_buf)
+
+        global running
+        try:
+            while running:
+                try:
+                    if receiver is not None:
+                        if not select.select([sock], [], [], 0.5)[0]:
+                            continue
+                        packets = receiver.recv()
+                    else:
+                        try:
+                            nbytes, _, _, addr = sock.recvmsg_into([recv_buf])
+                            packets = [(recv_view[:nbytes], addr, None)]
+                        except socket.timeout:
+                            continue
+
+                    for data, addr, info in packets:
+                        _handle_packet(data, addr, port, log_writer, tstats, info)
+
+                except Exception as e:
+                    logger.error("[端口 %d] 接收或处理数据时出错: %s", port, e)
+                    time.sleep(1)  # 避免错误情况下过快循环
+        finally:
+            log_writer.close()
+
+        sock.close()
+        logger.info(f"[端口 {port}] UDP监听器已关闭")
+            
+    except socket.error as e:
+        if e.errno == 10048:
+            logger.error(f"端口 {port} 已被占用，无法监听")
+        else:
+            logger.error(f"[端口 {port}] 创建套接字时出错: {e}")
+    except Exception as e:
+        logger.error(f"[端口 {port}] 初始化监听器时出错: {e}")
+
+def display_status():
+    """显示统计信息的线程函数"""
+    last_total = 0
+
+    # Event.wait代替sleep轮询: 每5秒醒一次, 关闭信号能立即打断
+    while not _shutdown.wait(5):
+        try:
+            # 读取侧合并各线程的统计(求和/Counter相加都是可交换的)
+            thread_stats = list(_per_thread_stats.values())
+            current_total = sum(s.total for s in thread_stats)
+            packets_per_period = current_total - last_total
+            last_total = current_total
+
+            command_counts = Counter()
+            for s in thread_stats:
+                command_counts.update(s.counts)
+
+            # 检查最后一个数据包的时间(各线程取最新, monotonic差值免墙钟跳变)
+            times = [s.last_ns for s in thread_stats if s.last_ns is not None]
+            last_ns = max(times) if times else None
+            time_since_last = (time.monotonic_ns() - last_ns) / 1e9 if last_ns else float('inf')
+            
+            # 显示状态信息
+            logger.info("-" * 50)
+            logger.info(f"状态更新: 总共接收 {current_total} 个数据包")
+            logger.info(f"过去5秒接收: {packets_per_period} 个数据包 ({packets_per_period/5:.1f}包/秒)")
+            
+            # 显示最后接收时间
+            if last_ns:
+                last_time_str = _ns_to_wall(last_ns).strftime('%H:%M:%S')
+                if time_since_last < 60:
+                    logger.info(f"最后接收时间: {last_time_str} ({time_since_last:.1f}秒前)")
+                else:
+                    logger.warning(f"最后接收时间: {last_time_str} ({time_since_last:.1f}秒前) - 可能连接已断开")
+            else:
+                logger.warning("尚未接收到任何数据包")
+                
+            # 显示命令统计(nlargest只选top-10, 畸形流量造成的海量
+            # 键也不会触发O(N log N)全排序)
+            if command_counts:
+                logger.info("命令类型统计:")
+                for cmd, count in heapq.nlargest(10, command_counts.items(),
+                                                 key=itemgetter(1)):
+                    logger.info(f"  {cmd}: {count}个")
+
+            # 显示最近的几条命令(合并各线程的环形缓冲后按时间取最新5条)
+            recent = sorted((c for s in thread_stats for c in s.last),
+                            key=lambda c: c['time_ns'])[-5:]
+            if recent:
+                logger.info("最近接收的命令:")
+                for i, cmd in enumerate(reversed(recent)):
+                    cmd_time = _ns_to_wall(cmd['time_ns']).strftime('%H:%M:%S')
+                    cmd_port = cmd['port']
+                    cmd_from = f"{cmd['from'][0]}:{cmd['from'][1]}"
+                    cmd_info = cmd['info']
+                    logger.info(f"  {i+1}. [{cmd_time}] [端口 {cmd_port}] [{cmd_from}] {cmd_info}")
+                    
+            # 如果长时间没有接收到数据，显示警告
+            if time_since_last > 30:
+                logger.warning("警告: 长时间未收到数据包，请检查:")
+                logger.warning("  1. Resim是否正在运行且已启动DS模式 (使用 --ds-mode 参数启动)")
+                logger.warning("  2. 网络连接是否正常")
+                logger.warning("  3. 是否启动了模拟 (发送 CS 命令)")
+                logger.warning("  4. 防火墙是否阻止了UDP连接")
+
+        except Exception as e:
+            logger.error(f"显示状态时出错: {e}")
+
+def main():
+    # 首先定义命令行参数解析器
+    parser = argparse.ArgumentParser(description='Resim UDP 接收解析工具')
+    
+    parser.add_argument('--ports', type=int, nargs='+', default=DEFAULT_PORTS,
+                      help=f'监听端口列表 (默认: {" ".join(map(str, DEFAULT_PORTS))})')
+    parser.add_argument('--ip', type=str, default=DEFAULT_IP,
+                      help=f'监听IP地址 (默认: {DEFAULT_IP})')
+    parser.add_argument('--log-unknown', action='store_true',
+                      help='对未知前缀的数据包也做完整十六进制展开')
+    parser.add_argument('--rt', action='store_true',
+                      help='监听线程使用SCHED_FIFO实时调度 (需要CAP_SYS_NICE)')
+
+    args = parser.parse_args()
+    if args.log_unknown:
+        global LOG_UNKNOWN
+        LOG_UNKNOWN = True
+    if args.rt:
+        global USE_RT
+        USE_RT = True
+    
+    # 创建日志目录(每个监听线程写自己的环形二进制文件)
+    log_dir = "udp_logs"
+    os.makedirs(log_dir, exist_ok=True)
+    log_base = os.path.join(log_dir, f"resim_udp_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+
+    try:
+        logger.info("===== Resim UDP 接收解析工具 =====")
+        logger.info(f"监听地址: {args.ip}, 端口: {args.ports}")
+        logger.info(f"日志文件: {log_base}_p<端口>s<线程>.ringlog (dump_log.py回放)")
+        logger.info("按Ctrl+C退出")
+        logger.info("-" * 50)
+        
+        # 创建并启动监听线程(SO_REUSEPORT可用时每端口多个)
+        listener_threads = []
+        for port in args.ports:
+            for slot in range(_NUM_LISTENERS):
+                thread = threading.Thread(
+                    target=udp_listener,
+                    args=(args.ip, port, log_base, slot),
+                    daemon=True
+                )
+                thread.start()
+                listener_threads.append(thread)
+        
+        # 创建并启动状态显示线程
+        status_thread = threading.Thread(target=display_status, daemon=True)
+        status_thread.start()
+        
+        # 主线程挂在关闭Event上, Ctrl+C立即唤醒, 无轮询也无退出竞态
+        global running
+        try:
+            _shutdown.wait()
+        except KeyboardInterrupt:
+            logger.info("\n用户中断，正在关闭...")
+
+    except Exception as e:
+        logger.error(f"程序出错: {e}")
+
+    # 通知所有线程退出
+    running = False
+    _shutdown.set()
+    logger.info("程序已退出")
+
+if __name__ == "__main__":
     main() 
\ No newline at end of file
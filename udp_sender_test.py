@@ -16,13 +16,78 @@ logger = logging.getLogger("UDPSenderTest")
 RESIM_IP = "127.0.0.1"
 SEND_PORT = 20001  # 发送到Re:sim的接收端口
 
+# 预编译的参数载荷格式, 避免每次pack重新解析格式串
+_S_III_LE = struct.Struct('<iii')
+_S_III_BE = struct.Struct('>iii')
+_S_IIIF_LE = struct.Struct('<iiif')
+
+# Linux下通过sendmmsg(2)把整个测试矩阵合并为一次系统调用(--no-pace压测模式)
+if sys.platform.startswith('linux'):
+    import ctypes
+
+    class _Iovec(ctypes.Structure):
+        _fields_ = [('iov_base', ctypes.c_void_p),
+                    ('iov_len', ctypes.c_size_t)]
+
+    class _Msghdr(ctypes.Structure):
+        _fields_ = [('msg_name', ctypes.c_void_p),
+                    ('msg_namelen', ctypes.c_uint32),
+                    ('msg_iov', ctypes.POINTER(_Iovec)),
+                    ('msg_iovlen', ctypes.c_size_t),
+                    ('msg_control', ctypes.c_void_p),
+                    ('msg_controllen', ctypes.c_size_t),
+                    ('msg_flags', ctypes.c_int)]
+
+    class _Mmsghdr(ctypes.Structure):
+        _fields_ = [('msg_hdr', _Msghdr),
+                    ('msg_len', ctypes.c_uint)]
+
+    class _SockaddrIn(ctypes.Structure):
+        _fields_ = [('sin_family', ctypes.c_ushort),
+                    ('sin_port', ctypes.c_uint16),
+                    ('sin_addr', ctypes.c_uint32),
+                    ('sin_zero', ctypes.c_ubyte * 8)]
+
+    try:
+        _libc = ctypes.CDLL('libc.so.6', use_errno=True)
+    except OSError:
+        _libc = None
+else:
+    _libc = None
+
+def _send_batch_mmsg(sock, payloads, ip, port):
+    """一次sendmmsg系统调用发送一组数据报, 返回内核实际接收的条数"""
+    n = len(payloads)
+    sa = _SockaddrIn()
+    sa.sin_family = socket.AF_INET
+    sa.sin_port = socket.htons(port)
+    # inet_aton返回网络序字节, 按本机内存序重新解释以保持结构体布局
+    sa.sin_addr = struct.unpack('=I', socket.inet_aton(ip))[0]
+
+    bufs = [ctypes.create_string_buffer(p, len(p)) for p in payloads]
+    iovs = (_Iovec * n)()
+    hdrs = (_Mmsghdr * n)()
+    for i, b in enumerate(bufs):
+        iovs[i].iov_base = ctypes.cast(b, ctypes.c_void_p)
+        iovs[i].iov_len = len(payloads[i])
+        hdrs[i].msg_hdr.msg_name = ctypes.cast(ctypes.pointer(sa), ctypes.c_void_p)
+        hdrs[i].msg_hdr.msg_namelen = ctypes.sizeof(sa)
+        hdrs[i].msg_hdr.msg_iov = ctypes.pointer(iovs[i])
+        hdrs[i].msg_hdr.msg_iovlen = 1
+
+    sent = _libc.sendmmsg(sock.fileno(), hdrs, n, 0)
+    if sent < 0:
+        raise OSError(ctypes.get_errno(), "sendmmsg调用失败")
+    return sent
+
+# 模块级发送socket只创建一次, 连续发送省去每包的socket/close系统调用
+_TX_SOCK = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
 def send_udp_packet(data, ip=RESIM_IP, port=SEND_PORT):
     """发送UDP数据包"""
     try:
-        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        sock.sendto(data, (ip, port))
-        sock.close()
-        
+        _TX_SOCK.sendto(data, (ip, port))
+
         # 打印16进制数据用于调试
         hex_data = binascii.hexlify(data).decode('ascii')
         logger.info(f"已发送UDP数据到 {ip}:{port}: {hex_data}")
@@ -31,8 +96,11 @@ def send_udp_packet(data, ip=RESIM_IP, port=SEND_PORT):
         logger.error(f"发送UDP数据包失败: {e}")
         return False
 
-def test_lane_change_commands():
-    """测试各种换道命令格式"""
+def test_lane_change_commands(no_pace=False):
+    """测试各种换道命令格式
+
+    no_pace为True时跳过观察间隔, Linux上整个矩阵合并为一次sendmmsg
+    """
     # 定义测试用的agent_id, direction和mode
     agent_id = 10
     direction = 0  # 0=左, 1=右
@@ -41,15 +109,15 @@ def test_lane_change_commands():
     # 测试不同的命令格式，看哪一个能被Resim接受
     test_commands = [
         # 测试1: "CL" + 参数 (原始C++代码中的格式)
-        (b'CL' + struct.pack('<iii', agent_id, direction, mode), 
+        (b'CL' + _S_III_LE.pack(agent_id, direction, mode), 
          "格式1: 'CL' + agent_id + direction + mode"),
         
         # 测试2: "FCAL" + 参数 (Python脚本中使用的格式)
-        (b'FCAL' + struct.pack('<iii', agent_id, direction, mode),
+        (b'FCAL' + _S_III_LE.pack(agent_id, direction, mode),
          "格式2: 'FCAL' + agent_id + direction + mode"),
         
         # 测试3: "ACL" + 参数 (可能的格式变体)
-        (b'ACL' + struct.pack('<iii', agent_id, direction, mode),
+        (b'ACL' + _S_III_LE.pack(agent_id, direction, mode),
          "格式3: 'ACL' + agent_id + direction + mode"),
         
         # 测试4: 纯"CL" (简单测试，看是否接受无参数命令)
@@ -57,7 +125,7 @@ def test_lane_change_commands():
          "格式4: 纯'CL'命令"),
         
         # 测试5: 不同的字节顺序
-        (b'CL' + struct.pack('>iii', agent_id, direction, mode),
+        (b'CL' + _S_III_BE.pack(agent_id, direction, mode),
          "格式5: 'CL' + agent_id + direction + mode (大端字节序)"),
         
         # 测试6: "CS" (模拟开始模拟命令，看能否激活Resim)
@@ -65,24 +133,37 @@ def test_lane_change_commands():
          "格式6: 'CS' 开始模拟命令"),
         
         # 测试7: 相同参数不同前缀
-        (b'LC' + struct.pack('<iii', agent_id, direction, mode),
+        (b'LC' + _S_III_LE.pack(agent_id, direction, mode),
          "格式7: 'LC' + agent_id + direction + mode"),
         
         # 测试8: 添加更多参数 (包含距离参数)
-        (b'CL' + struct.pack('<iiif', agent_id, direction, mode, 50.0),
+        (b'CL' + _S_IIIF_LE.pack(agent_id, direction, mode, 50.0),
          "格式8: 'CL' + agent_id + direction + mode + distance"),
         
         # 测试9: 前缀与参数间添加分隔符
-        (b'CL|' + struct.pack('<iii', agent_id, direction, mode),
+        (b'CL|' + _S_III_LE.pack(agent_id, direction, mode),
          "格式9: 'CL|' + agent_id + direction + mode"),
         
         # 测试10: 尝试其他可能的命令格式
-        (b'LANE' + struct.pack('<iii', agent_id, direction, mode),
+        (b'LANE' + _S_III_LE.pack(agent_id, direction, mode),
          "格式10: 'LANE' + agent_id + direction + mode")
     ]
     
     logger.info("开始测试各种换道命令格式...")
-    
+
+    # 压测模式: 一次sendmmsg推送整个矩阵, 非Linux退回逐包sendto(无间隔)
+    if no_pace:
+        if _libc is not None:
+            sent = _send_batch_mmsg(_TX_SOCK,
+                                    [cmd for cmd, _ in test_commands],
+                                    RESIM_IP, SEND_PORT)
+            logger.info(f"批量发送完成: {sent}/{len(test_commands)}")
+        else:
+            for command_data, description in test_commands:
+                send_udp_packet(command_data)
+            logger.info("所有测试命令已发送(无间隔)")
+        return
+
     # 逐一发送测试命令
     for command_data, description in test_commands:
         logger.info(f"测试 - {description}")
@@ -90,15 +171,20 @@ def test_lane_change_commands():
             logger.info("发送成功")
         else:
             logger.info("发送失败")
-        
+
         # 暂停2秒，以便观察Resim的反应
         time.sleep(2)
-    
+
     logger.info("所有测试命令已发送")
 
 def main():
     logger.info("UDP发送测试程序启动")
-    
+
+    # --no-pace: 跳过观察间隔, 压测Resim(Linux上用sendmmsg批量发送)
+    no_pace = '--no-pace' in sys.argv
+    if no_pace:
+        sys.argv.remove('--no-pace')
+
     # 检查命令行参数
     if len(sys.argv) > 1:
         # 如果有命令行参数，只发送特定格式的命令
@@ -113,16 +199,16 @@ def main():
             
             # 生成特定的测试命令
             test_commands = [
-                b'CL' + struct.pack('<iii', agent_id, direction, mode),
-                b'FCAL' + struct.pack('<iii', agent_id, direction, mode),
-                b'ACL' + struct.pack('<iii', agent_id, direction, mode),
+                b'CL' + _S_III_LE.pack(agent_id, direction, mode),
+                b'FCAL' + _S_III_LE.pack(agent_id, direction, mode),
+                b'ACL' + _S_III_LE.pack(agent_id, direction, mode),
                 b'CL',
-                b'CL' + struct.pack('>iii', agent_id, direction, mode),
+                b'CL' + _S_III_BE.pack(agent_id, direction, mode),
                 b'CS',
-                b'LC' + struct.pack('<iii', agent_id, direction, mode),
-                b'CL' + struct.pack('<iiif', agent_id, direction, mode, 50.0),
-                b'CL|' + struct.pack('<iii', agent_id, direction, mode),
-                b'LANE' + struct.pack('<iii', agent_id, direction, mode)
+                b'LC' + _S_III_LE.pack(agent_id, direction, mode),
+                b'CL' + _S_IIIF_LE.pack(agent_id, direction, mode, 50.0),
+                b'CL|' + _S_III_LE.pack(agent_id, direction, mode),
+                b'LANE' + _S_III_LE.pack(agent_id, direction, mode)
             ]
             
             command = test_commands[test_idx]
@@ -131,11 +217,11 @@ def main():
             
         except (ValueError, IndexError) as e:
             logger.error(f"参数错误: {e}")
-            logger.info("使用方法: python udp_sender_test.py [测试编号1-10]")
+            logger.info("使用方法: python udp_sender_test.py [测试编号1-10] [--no-pace]")
             return
     else:
         # 没有命令行参数，运行所有测试
-        test_lane_change_commands()
+        test_lane_change_commands(no_pace)
     
     logger.info("测试完成")
 
@@ -25,6 +25,11 @@ logger = logging.getLogger("ResimLaneChangeSender")
 RESIM_IP = "127.0.0.1"
 RESIM_PORT = 20001  # Resim接收命令的端口
 
+# 预编译的参数载荷格式, 避免每次pack重新解析格式串
+_S_III_LE = struct.Struct('<iii')
+_S_III_BE = struct.Struct('>iii')
+_S_IIIF_LE = struct.Struct('<iiif')
+
 def send_lane_change_command(agent_id, direction, mode, count=1, interval=1.0, ip=None, port=None):
     """发送车道变更命令到Resim
     
@@ -42,12 +47,14 @@ def send_lane_change_command(agent_id, direction, mode, count=1, interval=1.0, i
     if port is None:
         port = RESIM_PORT
         
+    # 目标固定, connect后用send()省去每包的目的地址处理
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    
+    sock.connect((ip, port))
+
     try:
         # 创建严格按照Resim UDPThread代码中要求的CL命令
-        # CL + struct.pack('<iii', agent_id, direction, mode)
-        command_data = b'CL' + struct.pack('<iii', agent_id, direction, mode)
+        # CL + _S_III_LE.pack(agent_id, direction, mode)
+        command_data = b'CL' + _S_III_LE.pack(agent_id, direction, mode)
         
         # 打印命令详情
         hex_data = binascii.hexlify(command_data).decode()
@@ -69,7 +76,7 @@ def send_lane_change_command(agent_id, direction, mode, count=1, interval=1.0, i
                 time.sleep(interval)
                 
             # 发送数据
-            sock.sendto(command_data, (ip, port))
+            sock.send(command_data)
             logger.info(f"[{i+1}/{count}] 已发送命令: {hex_data}")
             
         logger.info(f"完成发送 {count} 次命令")
@@ -87,17 +94,18 @@ def send_start_simulation_command(ip=None, port=None):
         port = RESIM_PORT
         
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    
+    sock.connect((ip, port))
+
     try:
         # 创建CS命令 (开始模拟)
         command_data = b'CS'
-        
+
         # 打印命令详情
         hex_data = binascii.hexlify(command_data).decode()
         logger.info(f"发送开始模拟命令 (CS): {hex_data}")
-        
+
         # 发送数据
-        sock.sendto(command_data, (ip, port))
+        sock.send(command_data)
         logger.info(f"已发送开始模拟命令")
         
     except Exception as e:
@@ -112,8 +120,10 @@ def send_test_pattern(ip=None, port=None):
     if port is None:
         port = RESIM_PORT
         
+    # 目标固定, connect后用send()省去每包的目的地址处理
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    
+    sock.connect((ip, port))
+
     try:
         # 测试参数
         agent_id = 10
@@ -123,31 +133,31 @@ def send_test_pattern(ip=None, port=None):
         # 不同格式的命令
         test_commands = [
             # 原格式 'CL' + 参数 (从UDPThread.cpp的代码分析)
-            (b'CL' + struct.pack('<iii', agent_id, direction, mode), 
+            (b'CL' + _S_III_LE.pack(agent_id, direction, mode), 
              "格式1: 'CL' + 参数 (原格式)"),
             
             # 尝试其他可能的前缀
-            (b'FCL' + struct.pack('<iii', agent_id, direction, mode),
+            (b'FCL' + _S_III_LE.pack(agent_id, direction, mode),
              "格式2: 'FCL' + 参数"),
             
             # 使用不同的参数排列
-            (b'CL' + struct.pack('<iii', agent_id, mode, direction),
+            (b'CL' + _S_III_LE.pack(agent_id, mode, direction),
              "格式3: 'CL' + 参数顺序变化"), 
             
             # 使用大端字节序
-            (b'CL' + struct.pack('>iii', agent_id, direction, mode),
+            (b'CL' + _S_III_BE.pack(agent_id, direction, mode),
              "格式4: 'CL' + 参数 (大端字节序)"),
              
             # 添加额外参数
-            (b'CL' + struct.pack('<iiif', agent_id, direction, mode, 100.0),
+            (b'CL' + _S_IIIF_LE.pack(agent_id, direction, mode, 100.0),
              "格式5: 'CL' + 参数 + 额外float"),
              
             # 尝试替代格式
-            (b'ACL' + struct.pack('<iii', agent_id, direction, mode),
+            (b'ACL' + _S_III_LE.pack(agent_id, direction, mode),
              "格式6: 'ACL' + 参数"),
              
             # 尝试命令中间有分隔符
-            (b'CL|' + struct.pack('<iii', agent_id, direction, mode),
+            (b'CL|' + _S_III_LE.pack(agent_id, direction, mode),
              "格式7: 'CL|' + 参数"),
         ]
         
@@ -155,7 +165,7 @@ def send_test_pattern(ip=None, port=None):
         logger.info("-" * 40)
         
         # 首先发送启动模拟命令
-        sock.sendto(b'CS', (ip, port))
+        sock.send(b'CS')
         logger.info("已发送开始模拟命令 (CS)")
         time.sleep(2)
         
@@ -167,8 +177,8 @@ def send_test_pattern(ip=None, port=None):
             logger.info(f"  原始数据: {hex_data}")
             
             # 发送数据
-            sock.sendto(command, (ip, port))
-            
+            sock.send(command)
+
             # 暂停一会等待处理
             time.sleep(2)
             
@@ -1,15 +1,56 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import array
+import asyncio
+import collections
+import functools
 import socket
 import struct
+import selectors
 import time
 import datetime
-import binascii
+import errno
+import queue
 import sys
 import threading
 import os
 
+# 大包解析走numpy.frombuffer: 构造定型数组零Python对象开销,
+# 环境没装numpy时退回批量Struct路径
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# 小包numpy的调用开销反而更高, 元素数达到该阈值才切换
+_NP_MIN_ELEMS = 32
+
+# C级双解释循环(见_parse_ext.pyx, 用setup_parse_ext.py构建),
+# 未编译时回退纯Python的批量Struct路径
+try:
+    import _parse_ext
+except ImportError:
+    _parse_ext = None
+
+@functools.lru_cache(maxsize=256)
+def _decode_cmd(b):
+    """4字节命令标识的解码缓存: 命令ID高度重复, 命中后只是一次dict查找"""
+    return b.decode('ascii', errors='replace')
+
+def _u32(tag):
+    """4字节ASCII命令标识按小端读成一个uint32(建表用)"""
+    return int.from_bytes(tag, 'little')
+
+# 已知命令的载荷模式: 命中后只按真实字段类型解包一次,
+# 不再对每个4字节字做int/float双重猜测
+# (格式对应udp_sender_test.py里的换道命令矩阵)
+# 键是小端uint32: 查表只做一次整数哈希, 不经过解码+字符串哈希
+_SCHEMAS = {
+    _u32(b'FCAL'): (struct.Struct('<iii'), ('agent_id', 'direction', 'mode')),
+    _u32(b'LANE'): (struct.Struct('<iii'), ('agent_id', 'direction', 'mode')),
+}
+
 # UDP监听配置
 LISTEN_IP = ""  # 空字符串表示监听所有网卡
 LISTEN_PORT = 20000  # Resim默认发送端口
@@ -18,33 +59,171 @@ BUFFER_SIZE = 4096  # 接收缓冲区大小
 # 日志设置
 LOG_FILE = "resim_udp_log.txt"
 ENABLE_LOGGING = True  # 是否将接收数据保存到日志文件
+LOG_MAX_BYTES = 64 * 1024 * 1024  # 单个日志文件上限, 超过即轮转
+LOG_BACKUPS = 5  # 保留的历史日志份数(.1最新 .5最旧)
+
+# 按元素个数缓存的批量解包格式: 同尺寸的数据包复用编译好的Struct,
+# 不必每包重新解析格式串
+_BULK_STRUCTS = {}
+
+def _bulk_structs(n):
+    """返回(int批量格式, float批量格式), 首次使用时编译并缓存"""
+    pair = _BULK_STRUCTS.get(n)
+    if pair is None:
+        pair = (struct.Struct(f'<{n}i'), struct.Struct(f'<{n}f'))
+        _BULK_STRUCTS[n] = pair
+    return pair
+
+# 模块级预编译的源地址格式(recv热路径每包用一次):
+# 复用编译结果, 不每次调用重新解析格式串
+_S_U32_NATIVE = struct.Struct('=I')
+
+# Linux下用recvmmsg(2)一次系统调用批量取走积压的数据报,
+# 把每包一次的用户/内核切换摊薄到整批上
+_RECV_BATCH = 32
+_MSG_DONTWAIT = 0x40
+
+if sys.platform.startswith('linux'):
+    import ctypes
+
+    class _Iovec(ctypes.Structure):
+        _fields_ = [('iov_base', ctypes.c_void_p),
+                    ('iov_len', ctypes.c_size_t)]
+
+    class _Msghdr(ctypes.Structure):
+        _fields_ = [('msg_name', ctypes.c_void_p),
+                    ('msg_namelen', ctypes.c_uint32),
+                    ('msg_iov', ctypes.POINTER(_Iovec)),
+                    ('msg_iovlen', ctypes.c_size_t),
+                    ('msg_control', ctypes.c_void_p),
+                    ('msg_controllen', ctypes.c_size_t),
+                    ('msg_flags', ctypes.c_int)]
+
+    class _Mmsghdr(ctypes.Structure):
+        _fields_ = [('msg_hdr', _Msghdr),
+                    ('msg_len', ctypes.c_uint)]
+
+    class _SockaddrIn(ctypes.Structure):
+        _fields_ = [('sin_family', ctypes.c_ushort),
+                    ('sin_port', ctypes.c_uint16),
+                    ('sin_addr', ctypes.c_uint32),
+                    ('sin_zero', ctypes.c_ubyte * 8)]
+
+    try:
+        _libc = ctypes.CDLL('libc.so.6', use_errno=True)
+    except OSError:
+        _libc = None
+else:
+    _libc = None
+
+class _BatchReceiver:
+    """recvmmsg批量接收器: 缓冲区池在构造时一次分配, 跨调用复用"""
+
+    def __init__(self, sock, buffer_size):
+        self.sock = sock
+        self.bufs = [ctypes.create_string_buffer(buffer_size)
+                     for _ in range(_RECV_BATCH)]
+        self.addrs = (_SockaddrIn * _RECV_BATCH)()
+        self.iovs = (_Iovec * _RECV_BATCH)()
+        self.hdrs = (_Mmsghdr * _RECV_BATCH)()
+        for i in range(_RECV_BATCH):
+            self.iovs[i].iov_base = ctypes.cast(self.bufs[i], ctypes.c_void_p)
+            self.iovs[i].iov_len = buffer_size
+            hdr = self.hdrs[i].msg_hdr
+            hdr.msg_name = ctypes.cast(ctypes.pointer(self.addrs[i]), ctypes.c_void_p)
+            hdr.msg_namelen = ctypes.sizeof(_SockaddrIn)
+            hdr.msg_iov = ctypes.pointer(self.iovs[i])
+            hdr.msg_iovlen = 1
+
+    def recv(self):
+        """非阻塞取走最多_RECV_BATCH个数据报, 返回[(data, addr)]列表"""
+        n = _libc.recvmmsg(self.sock.fileno(), self.hdrs,
+                           _RECV_BATCH, _MSG_DONTWAIT, None)
+        if n < 0:
+            err = ctypes.get_errno()
+            if err in (errno.EAGAIN, errno.EWOULDBLOCK):
+                return []
+            raise OSError(err, os.strerror(err))
+
+        packets = []
+        for i in range(n):
+            sa = self.addrs[i]
+            addr = (socket.inet_ntoa(_S_U32_NATIVE.pack(sa.sin_addr)),
+                    socket.ntohs(sa.sin_port))
+            packets.append((self.bufs[i].raw[:self.hdrs[i].msg_len], addr))
+            # 内核会改写msg_namelen, 下次调用前恢复
+            self.hdrs[i].msg_hdr.msg_namelen = ctypes.sizeof(_SockaddrIn)
+        return packets
+
+class _ResimProtocol(asyncio.DatagramProtocol):
+    """asyncio数据报协议: 收包回调直接复用UDPReceiver的处理逻辑"""
+
+    def __init__(self, receiver):
+        self.receiver = receiver
+
+    def datagram_received(self, data, addr):
+        self.receiver._process_data(data, addr)
 
 class UDPReceiver:
-    def __init__(self, ip="", port=20000, buffer_size=4096, enable_logging=True):
+    def __init__(self, ip="", port=20000, buffer_size=4096, enable_logging=True,
+                 verbose=False):
         self.ip = ip
         self.port = port
         self.buffer_size = buffer_size
+        # 回退路径(无recvmmsg)的常驻接收缓冲: recvfrom_into原地写入,
+        # 免去每包一次的4KB bytes分配
+        self._recv_buf = bytearray(buffer_size)
+        self._recv_view = memoryview(self._recv_buf)
         self.enable_logging = enable_logging
+        self.verbose = verbose  # 每包详情打印(批量经后台线程写stdout)
         self.socket = None
         self.running = False
-        self.packet_count = 0
-        self.last_packet_time = None
+        # 热计数器收拢成一条连续的uint64数组(SoA):
+        # [0]=总包数, [1]=总字节数, [2]=最近收包墙钟ns(0表示还没收到)
+        # 自增不做dict哈希, 三个计数落在同一缓存行
+        self._counters = array.array('Q', [0, 0, 0])
         self.log_file = LOG_FILE
-        
-        # 状态统计
+        self._log_fh = None
+        self._log_q = queue.SimpleQueue()
+        self._log_thread = None
+        # 自唤醒管道: stop()写一个字节立刻唤醒阻塞中的select,
+        # 空闲时接收循环完全睡眠, 不再每0.5秒空转检查running
+        self._wake_r = None
+        self._wake_w = None
+
+        # 慢路径统计(包数/字节数/最近收包时间在_counters数组里)
         self.stats = {
-            "total_packets": 0,
-            "total_bytes": 0,
             "start_time": None,
-            "command_types": {}
+            "command_types": collections.defaultdict(int)
         }
     
     def setup(self):
         """设置UDP监听socket"""
         try:
             self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            # 允许快速重启时复用处于TIME_WAIT的地址
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
             self.socket.bind((self.ip, self.port))
-            self.socket.settimeout(0.5)  # 设置超时，使循环可以定期检查退出条件
+            # 加大内核接收缓冲到8MB, 吸收突发流量避免用户态来不及取包时
+            # 内核静默丢包(默认一般只有208KB左右)
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF,
+                                   8 * 1024 * 1024)
+            actual = self.socket.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+            # Linux返回的是请求值的两倍(内核记账开销), 明显小于请求值
+            # 说明被net.core.rmem_max截断了
+            if actual < 8 * 1024 * 1024:
+                print(f"警告: 接收缓冲被内核截断为 {actual} 字节 "
+                      f"(可调大 net.core.rmem_max)")
+            self._wake_r, self._wake_w = socket.socketpair()
+            if self.enable_logging:
+                # 日志句柄整个生命周期只打开一次, 64KB缓冲把多条记录
+                # 合并成少量write系统调用(状态线程每5秒flush一次兜底)
+                self._log_fh = open(self.log_file, 'a',
+                                    buffering=65536, encoding='utf-8')
+            # 磁盘/控制台写出放到后台线程, 停顿的输出不再反压接收路径
+            self._log_thread = threading.Thread(
+                target=self._log_writer_thread, daemon=True)
+            self._log_thread.start()
             print(f"UDP监听器已启动，正在监听 {self.ip if self.ip else '所有IP'}:{self.port}")
             return True
         except Exception as e:
@@ -58,34 +237,53 @@ class UDPReceiver:
         
         self.running = True
         self.stats["start_time"] = datetime.datetime.now()
-        
-        # 创建状态显示线程
-        status_thread = threading.Thread(target=self._status_display_thread)
-        status_thread.daemon = True
-        status_thread.start()
-        
+
         try:
             print("开始监听UDP数据...")
             print("按Ctrl+C停止监听")
             print("=" * 60)
             
+            # Linux上批量收包: select等到有数据后一次syscall取走整批积压
+            receiver = (_BatchReceiver(self.socket, self.buffer_size)
+                        if _libc is not None else None)
+
+            # 同时盯住数据socket和唤醒管道: 无超时地阻塞等待,
+            # stop()写唤醒字节即可让循环立刻回到running判断
+            sel = selectors.DefaultSelector()
+            sel.register(self.socket, selectors.EVENT_READ)
+            sel.register(self._wake_r, selectors.EVENT_READ)
+
+            # 状态输出内联在接收循环里(单调钟定时, 不受墙钟跳变影响),
+            # 省掉独立状态线程及其每5秒的上下文切换和GIL争用
+            last_status_mono = time.monotonic()
+            status_count = 0
+            status_time = datetime.datetime.now()
+
             while self.running:
-                try:
-                    # 接收数据
-                    data, addr = self.socket.recvfrom(self.buffer_size)
-                    
-                    # 更新统计信息
-                    self.stats["total_packets"] += 1
-                    self.stats["total_bytes"] += len(data)
-                    self.packet_count += 1
-                    self.last_packet_time = datetime.datetime.now()
-                    
-                    # 处理接收到的数据
-                    self._process_data(data, addr)
-                    
-                except socket.timeout:
-                    # 超时继续循环
-                    pass
+                remaining = 5.0 - (time.monotonic() - last_status_mono)
+                events = sel.select(remaining if remaining > 0 else 0)
+                for key, _ in events:
+                    if key.fileobj is self._wake_r:
+                        self._wake_r.recv(64)  # 排干唤醒字节
+                        continue
+
+                    if receiver is not None:
+                        packets = receiver.recv()
+                    else:
+                        n, addr = self.socket.recvfrom_into(self._recv_buf)
+                        # memoryview切片不拷贝; 下游只在必须时bytes()复制
+                        packets = [(self._recv_view[:n], addr)]
+
+                    for data, addr in packets:
+                        # 统计更新已并入_process_data(计数器数组)
+                        self._process_data(data, addr)
+
+                if time.monotonic() - last_status_mono >= 5.0:
+                    status_count, status_time = self._display_status_once(
+                        status_count, status_time)
+                    last_status_mono = time.monotonic()
+
+            sel.close()
         
         except KeyboardInterrupt:
             print("\n用户中断，停止监听")
@@ -95,172 +293,319 @@ class UDPReceiver:
             self.stop()
             return True
     
+    def start_async(self):
+        """asyncio模式启动: 内核只在有数据到达时唤醒, 无0.5秒超时空转
+
+        收包走DatagramProtocol回调, 周期统计是事件循环上的任务,
+        不再需要独立的状态线程
+        """
+        if not self.setup():
+            return False
+
+        self.running = True
+        self.stats["start_time"] = datetime.datetime.now()
+
+        try:
+            print("开始监听UDP数据 (asyncio模式)...")
+            print("按Ctrl+C停止监听")
+            print("=" * 60)
+            asyncio.run(self._run_async())
+        except KeyboardInterrupt:
+            print("\n用户中断，停止监听")
+        except Exception as e:
+            print(f"\n监听出错: {e}")
+        finally:
+            self.stop()
+            return True
+
+    async def _run_async(self):
+        """把已绑定的socket交给事件循环, 挂起直到被中断"""
+        loop = asyncio.get_running_loop()
+        transport, _ = await loop.create_datagram_endpoint(
+            lambda: _ResimProtocol(self), sock=self.socket)
+        status_task = asyncio.ensure_future(self._status_loop_async())
+        try:
+            await asyncio.Event().wait()
+        finally:
+            status_task.cancel()
+            transport.close()
+
     def stop(self):
         """停止UDP监听"""
         self.running = False
+        # 唤醒可能阻塞在select上的接收循环
+        if self._wake_w:
+            try:
+                self._wake_w.send(b'x')
+            except OSError:
+                pass
         if self.socket:
             self.socket.close()
             self.socket = None
-        
+
+        if self._wake_r:
+            self._wake_r.close()
+            self._wake_w.close()
+            self._wake_r = self._wake_w = None
+
+        # 哨兵通知写线程排干剩余队列后退出, 再关句柄
+        if self._log_thread:
+            self._log_q.put(None)
+            self._log_thread.join(timeout=2.0)
+            self._log_thread = None
+
+        if self._log_fh:
+            try:
+                self._log_fh.flush()
+            finally:
+                self._log_fh.close()
+                self._log_fh = None
+
         # 显示最终统计信息
         self._display_final_stats()
     
     def _process_data(self, data, addr):
         """处理接收到的UDP数据包"""
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-        
-        # 提取命令标识符（如果有）
+        # 热路径只取整数时间戳(time_ns是一次C调用),
+        # strftime格式化推迟到后台写线程/verbose展示时才做
+        ts_ns = time.time_ns()
+
+        counters = self._counters
+        counters[0] += 1
+        counters[1] += len(data)
+        counters[2] = ts_ns
+
+        # 提取命令标识符（如果有）: 热路径上只读一个uint32做统计键,
+        # 解码成字符串推迟到真正要展示/记日志时
         command_id = "Unknown"
         if len(data) >= 4:
-            try:
-                command_id = data[:4].decode('ascii', errors='replace')
-                # 更新命令类型统计
-                if command_id in self.stats["command_types"]:
-                    self.stats["command_types"][command_id] += 1
-                else:
-                    self.stats["command_types"][command_id] = 1
-            except:
-                pass
-        
-        # 显示数据包信息
-        print(f"\n[{timestamp}] 接收到数据包 #{self.packet_count}")
-        print(f"发送方: {addr[0]}:{addr[1]}")
-        print(f"数据大小: {len(data)} 字节")
-        print(f"命令ID: {command_id}")
-        
-        # 解析数据
-        self._parse_data(data)
+            cmd_u32 = int.from_bytes(data[:4], 'little')
+            self.stats["command_types"][cmd_u32] += 1
+            if self.verbose or self.enable_logging:
+                command_id = _decode_cmd(cmd_u32.to_bytes(4, 'little'))
         
+        # 十六进制转换每包只做一次(bytes.hex()单趟C实现), 展示与日志共用
+        hex_data = data.hex() if (self.verbose or self.enable_logging) else None
+
+        # 每包详情只在verbose时构造, 整包文本一次入队批量写stdout
+        if self.verbose:
+            timestamp = datetime.datetime.fromtimestamp(
+                ts_ns / 1e9).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+            lines = [f"\n[{timestamp}] 接收到数据包 #{counters[0]}",
+                     f"发送方: {addr[0]}:{addr[1]}",
+                     f"数据大小: {len(data)} 字节",
+                     f"命令ID: {command_id}"]
+
+            # 解析数据
+            self._parse_data(data, lines, hex_data)
+            self._log_q.put(('out', '\n'.join(lines) + '\n'))
+
         # 记录到日志文件
         if self.enable_logging:
-            self._log_data(timestamp, addr, data, command_id)
+            self._log_data(ts_ns, addr, data, command_id, hex_data)
     
-    def _parse_data(self, data):
-        """解析UDP数据包内容"""
+    def _parse_data(self, data, lines, hex_data):
+        """解析UDP数据包内容, 结果追加到lines(由调用方批量输出)"""
         try:
-            # 显示十六进制原始数据
-            hex_data = binascii.hexlify(data).decode()
-            print(f"原始数据: {hex_data}")
-            
-            # 尝试解析ASCII内容
-            try:
-                ascii_str = data.decode('ascii', errors='replace')
-                print(f"ASCII解析: {ascii_str}")
-            except:
-                pass
-            
+            # 显示十六进制原始数据(调用方已转换好)
+            lines.append(f"原始数据: {hex_data}")
+
+            # 尝试解析ASCII内容(errors='replace'保证解码不会抛异常)
+            ascii_str = bytes(data).decode('ascii', errors='replace')
+            lines.append(f"ASCII解析: {ascii_str}")
+
             # 解析二进制结构
             if len(data) >= 4:
                 # 假设前4字节是命令标识
-                command = data[:4].decode('ascii', errors='replace')
-                
-                # 从第5个字节开始尝试解析整数和浮点数值
-                pos = 4
+                command = _decode_cmd(bytes(data[:4]))
+
+                # 已知命令按模式表解包真实字段后即返回(uint32键查表)
+                schema = _SCHEMAS.get(int.from_bytes(data[:4], 'little'))
+                if schema is not None and len(data) >= 4 + schema[0].size:
+                    s, names = schema
+                    lines.append("解析值(按命令模式):")
+                    for name, val in zip(names, s.unpack_from(data, 4)):
+                        lines.append(f"  {name} = {val}")
+                    lines.append("-" * 60)
+                    return
+
+                # 从第5个字节开始的对齐尾部一次性批量解包:
+                # 每包两次C调用, 代替每4字节两次struct.unpack的Python循环
+                n = (len(data) - 4) // 4
                 values = []
-                
-                while pos + 4 <= len(data):
-                    try:
-                        # 解析为整数
-                        int_val = struct.unpack('<i', data[pos:pos+4])[0]
-                        # 解析为浮点数
-                        float_val = struct.unpack('<f', data[pos:pos+4])[0]
-                        
-                        values.append({
-                            "position": f"{pos}-{pos+3}",
-                            "int": int_val,
-                            "float": float_val
-                        })
-                        
-                        pos += 4
-                    except:
-                        break
-                
+                if n >= _NP_MIN_ELEMS and np is not None:
+                    # 大包(Resim向量可达1536个float)直接在原缓冲上
+                    # 构造定型数组, 只对真正要打印的部分转Python对象
+                    pairs = zip(np.frombuffer(data, dtype='<i4', offset=4,
+                                              count=n).tolist(),
+                                np.frombuffer(data, dtype='<f4', offset=4,
+                                              count=n).tolist())
+                elif n > 0 and _parse_ext is not None:
+                    # C扩展里指针步进完成整个双解释循环
+                    pairs = _parse_ext.parse_words(data)
+                elif n > 0:
+                    # unpack_from直接在原缓冲区偏移4处读取, 不切片拷贝
+                    int_s, float_s = _bulk_structs(n)
+                    pairs = zip(int_s.unpack_from(data, 4),
+                                float_s.unpack_from(data, 4))
+                if n > 0:
+                    values = [
+                        {"position": f"{4 + 4 * i}-{4 + 4 * i + 3}",
+                         "int": iv,
+                         "float": fv}
+                        for i, (iv, fv) in enumerate(pairs)
+                    ]
+
+
                 # 显示解析结果
                 if values:
-                    print("解析值:")
+                    lines.append("解析值:")
                     for val in values:
-                        print(f"  位置 {val['position']}: 整数={val['int']}, 浮点数={val['float']}")
-            
-            print("-" * 60)
-            
+                        lines.append(f"  位置 {val['position']}: 整数={val['int']}, 浮点数={val['float']}")
+
+            lines.append("-" * 60)
+
         except Exception as e:
-            print(f"解析数据失败: {e}")
-            print("-" * 60)
+            lines.append(f"解析数据失败: {e}")
+            lines.append("-" * 60)
     
-    def _log_data(self, timestamp, addr, data, command_id):
-        """将数据包记录到日志文件"""
-        try:
-            with open(self.log_file, 'a', encoding='utf-8') as f:
-                hex_data = binascii.hexlify(data).decode()
-                log_entry = f"{timestamp}|{addr[0]}:{addr[1]}|{len(data)}|{command_id}|{hex_data}\n"
-                f.write(log_entry)
-        except Exception as e:
-            print(f"写入日志失败: {e}")
+    def _log_data(self, ts_ns, addr, data, command_id, hex_data):
+        """把日志记录交给后台写线程(接收路径只入队原始字段, 不格式化时间)"""
+        self._log_q.put(
+            ('log',
+             (ts_ns, f"{addr[0]}:{addr[1]}|{len(data)}|{command_id}|{hex_data}\n")))
+
+    def _rotate_log(self):
+        """关闭当前日志, 依次顺延历史备份后重新打开(只在写线程里调用)"""
+        self._log_fh.close()
+        for i in range(LOG_BACKUPS - 1, 0, -1):
+            src = f"{self.log_file}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.log_file}.{i + 1}")
+        os.replace(self.log_file, f"{self.log_file}.1")
+        self._log_fh = open(self.log_file, 'a',
+                            buffering=65536, encoding='utf-8')
+
+    def _log_writer_thread(self):
+        """后台写线程: 阻塞取首条, 再批量排干队列, 按目标合并写出
+
+        队列条目为(目标, 内容): 'out'(stdout)携带现成文本,
+        'log'(日志文件)携带(墙钟ns, 尾部文本), 时间戳在这里才格式化
+        """
+        _fromts = datetime.datetime.fromtimestamp
+        while True:
+            item = self._log_q.get()
+            if item is None:
+                return
+            batch = [item]
+            while len(batch) < 256:
+                try:
+                    item = self._log_q.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    # 哨兵放回队列, 写完本批后下一轮退出
+                    self._log_q.put(None)
+                    break
+                batch.append(item)
+
+            log_parts = []
+            out_parts = []
+            for dest, payload in batch:
+                if dest == 'log':
+                    ts_ns, tail = payload
+                    ts = _fromts(ts_ns / 1e9).strftime(
+                        "%Y-%m-%d %H:%M:%S.%f")[:-3]
+                    log_parts.append(f"{ts}|{tail}")
+                else:
+                    out_parts.append(payload)
+            try:
+                if log_parts:
+                    self._log_fh.write(''.join(log_parts))
+                    # 写线程独占句柄, 在这里检查大小并轮转,
+                    # 高流量下日志不会无限增长拖垮磁盘IO
+                    if self._log_fh.tell() > LOG_MAX_BYTES:
+                        self._rotate_log()
+                if out_parts:
+                    sys.stdout.write(''.join(out_parts))
+                    sys.stdout.flush()
+            except Exception as e:
+                print(f"写入日志失败: {e}")
     
-    def _status_display_thread(self):
-        """状态显示线程，定期显示接收统计信息"""
+    async def _status_loop_async(self):
+        """asyncio模式下的周期状态任务, 与状态线程共用展示逻辑"""
         last_count = 0
         last_time = datetime.datetime.now()
-        
-        while self.running:
-            time.sleep(5)  # 每5秒更新一次
-            
-            now = datetime.datetime.now()
-            elapsed = (now - last_time).total_seconds()
-            
-            # 计算接收速率
-            new_packets = self.packet_count - last_count
-            rate = new_packets / elapsed if elapsed > 0 else 0
-            
-            # 更新上次统计
-            last_count = self.packet_count
-            last_time = now
-            
-            # 显示状态信息
-            if self.packet_count > 0:
-                total_elapsed = (now - self.stats["start_time"]).total_seconds()
-                avg_rate = self.packet_count / total_elapsed if total_elapsed > 0 else 0
-                
-                print(f"\n--- 状态更新 ---")
-                print(f"总计接收: {self.packet_count} 个数据包 ({self.stats['total_bytes']/1024:.2f} KB)")
-                print(f"当前接收速率: {rate:.2f} 包/秒")
-                print(f"平均接收速率: {avg_rate:.2f} 包/秒")
-                
-                if self.last_packet_time:
-                    last_recv = (now - self.last_packet_time).total_seconds()
-                    print(f"距上次接收: {last_recv:.1f} 秒")
-                
-                # 显示命令类型统计
-                if self.stats["command_types"]:
-                    print("命令类型统计:")
-                    for cmd, count in self.stats["command_types"].items():
-                        print(f"  {cmd}: {count} 次")
-                
-                print("-" * 60)
-    
+
+        while True:
+            await asyncio.sleep(5)
+            last_count, last_time = self._display_status_once(last_count, last_time)
+
+    def _display_status_once(self, last_count, last_time):
+        """输出一轮统计并flush日志, 返回更新后的(计数, 时间)基准"""
+        # 定期flush日志缓冲, 限定崩溃时最多丢5秒记录
+        if self._log_fh:
+            try:
+                self._log_fh.flush()
+            except ValueError:
+                pass  # stop()刚关闭句柄
+
+        now = datetime.datetime.now()
+        elapsed = (now - last_time).total_seconds()
+
+        # 计算接收速率
+        packet_count, total_bytes, last_ns = self._counters
+        new_packets = packet_count - last_count
+        rate = new_packets / elapsed if elapsed > 0 else 0
+
+        # 显示状态信息
+        if packet_count > 0:
+            total_elapsed = (now - self.stats["start_time"]).total_seconds()
+            avg_rate = packet_count / total_elapsed if total_elapsed > 0 else 0
+
+            print(f"\n--- 状态更新 ---")
+            print(f"总计接收: {packet_count} 个数据包 ({total_bytes/1024:.2f} KB)")
+            print(f"当前接收速率: {rate:.2f} 包/秒")
+            print(f"平均接收速率: {avg_rate:.2f} 包/秒")
+
+            if last_ns:
+                last_recv = (time.time_ns() - last_ns) / 1e9
+                print(f"距上次接收: {last_recv:.1f} 秒")
+
+            # 显示命令类型统计
+            if self.stats["command_types"]:
+                print("命令类型统计:")
+                for cmd, count in self.stats["command_types"].items():
+                    print(f"  {_decode_cmd(cmd.to_bytes(4, 'little'))}: {count} 次")
+
+            print("-" * 60)
+
+        return packet_count, now
+
     def _display_final_stats(self):
         """显示最终统计信息"""
         if self.stats["start_time"]:
             end_time = datetime.datetime.now()
             total_elapsed = (end_time - self.stats["start_time"]).total_seconds()
-            
+            total_packets, total_bytes, _ = self._counters
+
             print("\n=== 最终统计信息 ===")
             print(f"监听时长: {total_elapsed:.1f} 秒")
-            print(f"总计接收: {self.stats['total_packets']} 个数据包 ({self.stats['total_bytes']/1024:.2f} KB)")
-            
+            print(f"总计接收: {total_packets} 个数据包 ({total_bytes/1024:.2f} KB)")
+
             if total_elapsed > 0:
-                avg_rate = self.stats["total_packets"] / total_elapsed
+                avg_rate = total_packets / total_elapsed
                 print(f"平均接收速率: {avg_rate:.2f} 包/秒")
-            
+
             if self.stats["command_types"]:
                 print("\n命令类型统计:")
                 for cmd, count in sorted(self.stats["command_types"].items(), key=lambda x: x[1], reverse=True):
-                    print(f"  {cmd}: {count} 次 ({count/self.stats['total_packets']*100:.1f}%)")
-            
+                    print(f"  {_decode_cmd(cmd.to_bytes(4, 'little'))}: {count} 次 ({count/total_packets*100:.1f}%)")
+
             if self.enable_logging and os.path.exists(self.log_file):
                 print(f"\n接收日志已保存至: {os.path.abspath(self.log_file)}")
-            
-            if self.stats["total_packets"] == 0:
+
+            if total_packets == 0:
                 print("\n未接收到任何数据包，可能的原因:")
                 print("1. Resim未启动或未进入模拟状态")
                 print("2. Resim未启用DS模式 (使用--ds-mode启动参数)")
@@ -275,7 +620,19 @@ def main():
     
     # 解析命令行参数
     port = LISTEN_PORT
-    
+
+    # -v/--verbose: 打印每个数据包的详情(默认只显示周期统计)
+    verbose = False
+    for flag in ('-v', '--verbose'):
+        if flag in sys.argv:
+            sys.argv.remove(flag)
+            verbose = True
+
+    # --asyncio: 事件驱动模式, 收包走DatagramProtocol回调
+    use_asyncio = '--asyncio' in sys.argv
+    if use_asyncio:
+        sys.argv.remove('--asyncio')
+
     if len(sys.argv) > 1:
         try:
             port = int(sys.argv[1])
@@ -286,8 +643,11 @@ def main():
         print(f"使用默认端口: {port}")
     
     # 创建并启动监听器
-    receiver = UDPReceiver(port=port)
-    receiver.start()
+    receiver = UDPReceiver(port=port, verbose=verbose)
+    if use_asyncio:
+        receiver.start_async()
+    else:
+        receiver.start()
 
 
 if __name__ == "__main__":